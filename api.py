@@ -0,0 +1,369 @@
+"""Headless HTTP API for the assistant features, on the same core as the Streamlit UI.
+
+Endpoints (JSON in, JSON out; add `"stream": true` for server-sent events):
+    POST /v1/content    {"topic", "content_type", "length", "tone"}
+    POST /v1/translate  {"text", "source_lang", "target_lang"}
+    POST /v1/code       {"description", "language", "complexity", "comments", "examples", "error_handling"}
+    POST /v1/explain    {"code", "level"}
+    POST /v1/chat       {"messages": [{"role": "user"|"assistant", "content"}], "token_budget"}
+    GET  /healthz, GET /metrics
+
+Every POST also accepts "model" (a name from ROUTER_MODELS or the cascade
+label), "cache" (default true) and "semantic" (default false: also reuse the
+answer to a near-duplicate chat question). Examples:
+    python api.py --port 8000                 # live Gemini, needs GOOGLE_API_KEY
+    python api.py --mock --latency 0.3        # offline mock backend
+    curl -N localhost:8000/v1/chat -d '{"messages": [{"role": "user", "content": "Hi"}], "stream": true}'
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import prompts
+from assistant import Assistant
+from engine import GenerationEngine
+from generation import DEFAULT_MODEL_NAME
+from memory import CHAT_TOKEN_BUDGET, ConversationMemory
+from resilience import ResiliencePolicy
+from response_cache import ResponseCache
+from router import CASCADE, ROUTER_MODELS, ModelRouter
+from semantic_cache import SemanticCache
+from shared_state import SHARED_STATE_URL, SharedResponseCache, open_backend, shared_rate_limiter
+from telemetry import Telemetry
+from translation_memory import TranslationMemory
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Requests being served at once; model calls are further capped by ENGINE_MAX_WORKERS
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "64"))
+API_MAX_BODY_BYTES = int(os.getenv("API_MAX_BODY_BYTES", str(1024 * 1024)))
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+COMPLEXITIES = ["Beginner", "Intermediate", "Advanced"]
+_KIND_NAMES = {str: "a string", int: "an integer", bool: "a boolean", list: "a list"}
+
+
+def _field(body, name, default=None, required=False, kind=str, choices=None):
+    value = body.get(name, default)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ApiError(400, f"'{name}' is required")
+        return default
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ApiError(400, f"'{name}' must be {_KIND_NAMES.get(kind, kind.__name__)}")
+    if choices is not None and value not in choices:
+        raise ApiError(400, f"'{name}' must be one of: {', '.join(choices)}")
+    return value
+
+
+def _options(body, specs):
+    """Optional fields present in `body`, checked against `specs` of `name: (kind, choices)`."""
+    return {
+        name: _field(body, name, kind=kind, choices=choices)
+        for name, (kind, choices) in specs.items() if body.get(name) is not None
+    }
+
+
+# Each route maps the JSON body to the keyword arguments of one `Assistant` method
+def _content_args(body):
+    args = {"topic": _field(body, "topic", required=True)}
+    args.update(_options(body, {
+        "content_type": (str, prompts.CONTENT_TYPES),
+        "length": (str, prompts.CONTENT_LENGTHS),
+        "tone": (str, prompts.TONES),
+    }))
+    return "write_content", args
+
+
+def _translate_args(body):
+    return "translate", {
+        "text": _field(body, "text", required=True),
+        "source_lang": _field(body, "source_lang", "English"),
+        "target_lang": _field(body, "target_lang", required=True),
+    }
+
+
+def _code_args(body):
+    args = {"description": _field(body, "description", required=True)}
+    args.update(_options(body, {
+        "language": (str, prompts.PROGRAMMING_LANGUAGES),
+        "complexity": (str, COMPLEXITIES),
+        "comments": (bool, None),
+        "examples": (bool, None),
+        "error_handling": (bool, None),
+    }))
+    return "generate_code", args
+
+
+def _explain_args(body):
+    return "explain_code", {"code": _field(body, "code", required=True), "level": _field(body, "level", "Intermediate")}
+
+
+def _chat_args(body):
+    messages = _field(body, "messages", required=True, kind=list)
+    if not all(
+        isinstance(message, dict) and message.get("role") in ("user", "assistant")
+        and isinstance(message.get("content"), str)
+        for message in messages
+    ):
+        raise ApiError(400, "'messages' must be a list of {\"role\", \"content\"} objects "
+                            "with role \"user\" or \"assistant\" and string content")
+    history = [(message["role"], message["content"]) for message in messages]
+    if not history or history[-1][0] != "user":
+        raise ApiError(400, "The last message must come from the user")
+    token_budget = _field(body, "token_budget", CHAT_TOKEN_BUDGET, kind=int)
+    if token_budget < 1:
+        raise ApiError(400, "'token_budget' must be positive")
+    # Stateless: older turns beyond the budget are summarized for this request only
+    return "chat", {"history": history, "memory": ConversationMemory(token_budget)}
+
+
+ROUTES = {
+    "/v1/content": _content_args,
+    "/v1/translate": _translate_args,
+    "/v1/code": _code_args,
+    "/v1/explain": _explain_args,
+    "/v1/chat": _chat_args,
+}
+
+
+def _result_json(result, model_name):
+    return {
+        "text": result.text,
+        "model": model_name,
+        "cached": result.cached,
+        "prefetched": result.prefetched,
+        "ttft": result.ttft,
+        "elapsed": result.elapsed,
+    }
+
+
+class ApiServer:
+    """Minimal HTTP/1.1 server on asyncio streams with keep-alive and server-sent events.
+
+    Feature calls are blocking, so each runs on a bounded thread pool while
+    the event loop keeps accepting connections and relaying streamed text.
+    """
+
+    def __init__(self, assistant, telemetry=None, max_concurrency=API_MAX_CONCURRENCY):
+        self.assistant = assistant
+        self.telemetry = telemetry
+        self.models = set(ROUTER_MODELS) | {CASCADE}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="api")
+
+    async def serve(self, host=API_HOST, port=API_PORT):
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._send_json(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send_json(writer, 400, {"error": "Invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > API_MAX_BODY_BYTES:
+                    await self._send_json(writer, 413, {"error": "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                keep_alive = await self._dispatch(writer, method, target.split("?", 1)[0], body, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, writer, method, path, body, keep_alive):
+        if method == "GET" and path == "/healthz":
+            await self._send_json(writer, 200, {"status": "ok", "in_flight": self.assistant.engine.in_flight}, keep_alive)
+            return keep_alive
+        if method == "GET" and path == "/metrics" and self.telemetry is not None:
+            await self._send(writer, 200, self.telemetry.prometheus_text().encode("utf-8"),
+                             "text/plain; version=0.0.4", keep_alive)
+            return keep_alive
+        if path not in ROUTES:
+            await self._send_json(writer, 404, {"error": f"No route for {path}"}, keep_alive)
+            return keep_alive
+        if method != "POST":
+            await self._send_json(writer, 405, {"error": "Use POST"}, keep_alive)
+            return keep_alive
+
+        try:
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise ApiError(400, "Body must be JSON")
+            if not isinstance(payload, dict):
+                raise ApiError(400, "Body must be a JSON object")
+            name, args = ROUTES[path](payload)
+            model = payload.get("model", DEFAULT_MODEL_NAME)
+            if not isinstance(model, str) or model not in self.models:
+                raise ApiError(400, f"Unknown model '{model}', expected one of: {', '.join(sorted(self.models))}")
+            args.update(
+                model=model, use_cache=_field(payload, "cache", True, kind=bool),
+                semantic=_field(payload, "semantic", False, kind=bool),
+            )
+        except ApiError as e:
+            await self._send_json(writer, e.status, {"error": str(e)}, keep_alive)
+            return keep_alive
+
+        call = functools.partial(getattr(self.assistant, name), **args)
+        if payload.get("stream"):
+            await self._stream(writer, call)
+            return False
+
+        loop = asyncio.get_running_loop()
+        try:
+            result, model_name = await loop.run_in_executor(self._executor, call)
+        except Exception as e:
+            await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive)
+        else:
+            await self._send_json(writer, 200, _result_json(result, model_name), keep_alive)
+        return keep_alive
+
+    async def _stream(self, writer, call):
+        """Relay text as server-sent `chunk` events (deltas), then one `done` or `error` event."""
+        loop = asyncio.get_running_loop()
+        updates = asyncio.Queue()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+
+        def on_chunk(text):
+            loop.call_soon_threadsafe(updates.put_nowait, text)
+
+        future = loop.run_in_executor(self._executor, functools.partial(call, stream=True, on_chunk=on_chunk))
+        future.add_done_callback(lambda _: updates.put_nowait(None))
+        sent = ""
+        while True:
+            text = await updates.get()
+            if text is None:
+                break
+            if not text.startswith(sent):
+                # The cascade escalated to another model, which streams its answer from the start
+                writer.write(b"event: reset\ndata: {}\n\n")
+                sent = ""
+            writer.write(f"event: chunk\ndata: {json.dumps({'text': text[len(sent):]})}\n\n".encode("utf-8"))
+            sent = text
+            await writer.drain()
+
+        try:
+            result, model_name = future.result()
+        except Exception as e:
+            writer.write(f"event: error\ndata: {json.dumps({'error': f'{type(e).__name__}: {e}'})}\n\n".encode("utf-8"))
+        else:
+            writer.write(f"event: done\ndata: {json.dumps(_result_json(result, model_name))}\n\n".encode("utf-8"))
+        await writer.drain()
+
+    async def _send_json(self, writer, status, payload, keep_alive):
+        await self._send(writer, status, json.dumps(payload).encode("utf-8"), "application/json", keep_alive)
+
+    async def _send(self, writer, status, body, content_type, keep_alive):
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            .encode("latin-1") + body
+        )
+        await writer.drain()
+
+
+def create_model_factory(args):
+    if args.mock:
+        from mock_model import MockModel
+
+        def factory(name):
+            return MockModel(model_name=name, latency=args.latency, response_words=args.response_words)
+    else:
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise SystemExit("GOOGLE_API_KEY is not set")
+        genai.configure(api_key=api_key)
+
+        def factory(name):
+            return genai.GenerativeModel(name)
+    # One client per model name for the life of the process, shared by every request
+    return functools.lru_cache(maxsize=None)(factory)
+
+
+def create_assistant(args):
+    telemetry = Telemetry()
+    # Replicas behind one load balancer share the Gemini quota and the response cache
+    shared_state = open_backend(args.shared_state)
+    resilience = ResiliencePolicy(telemetry=telemetry, bucket=shared_rate_limiter(shared_state))
+    engine = GenerationEngine(telemetry=telemetry, resilience=resilience)
+    router = ModelRouter(create_model_factory(args), telemetry=telemetry)
+    if args.no_cache:
+        return Assistant(engine, router), telemetry
+    cache = SharedResponseCache(shared_state) if shared_state is not None else ResponseCache()
+    return Assistant(engine, router, cache, SemanticCache(exact=cache), TranslationMemory()), telemetry
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve AI Assistant Pro features over HTTP.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=API_MAX_CONCURRENCY)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response caches")
+    parser.add_argument("--shared-state", default=SHARED_STATE_URL,
+                        help="sqlite:///path or redis://host:port/db shared with other replicas")
+    mock = parser.add_argument_group("mock backend")
+    mock.add_argument("--mock", action="store_true", help="Serve from the offline mock model instead of Gemini")
+    mock.add_argument("--latency", type=float, default=0.2)
+    mock.add_argument("--response-words", type=int, default=120)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    assistant, telemetry = create_assistant(args)
+    server = ApiServer(assistant, telemetry, args.max_concurrency)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        assistant.engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
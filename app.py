@@ -1,15 +1,68 @@
+import time
+script_start = time.perf_counter()
+
 import streamlit as st
-import google.generativeai as genai
+import io
+import json
 import os
+import re
+import uuid
+import zipfile
 from dotenv import load_dotenv
 from streamlit_option_menu import option_menu
-from streamlit_chat import message
-import requests
-from streamlit_lottie import st_lottie
-import time
+from startup import StartupReport
+from assets import LottieLoader
+from engine import GenerationEngine
+from resilience import ResiliencePolicy
+from router import CASCADE, CASCADE_MODELS, ROUTER_MODELS, ModelRouter
+from telemetry import METRICS_PORT, LATENCY_BUCKETS, Telemetry, start_metrics_server
+from response_cache import ResponseCache
+from translation_memory import TranslationMemory
+from shared_state import SharedChatLog, SharedResponseCache, open_backend, shared_rate_limiter
+from prefetch import Prefetcher
+import batch_translate
+import bulk_jobs
+from chat_history import ChatHistory, purge_spill_logs
+from history_store import HistoryStore
+from memory import ConversationMemory, CHAT_TOKEN_BUDGET
+from chat_backend import CHAT_MODES, NATIVE_MODE, NativeChatSession, create_chat_model
+from generation import DEFAULT_MODEL_NAME
+import prompts
+from assistant import SEMANTIC_FEATURES, Assistant
+
+import_seconds = time.perf_counter() - script_start
+
+# Page configuration
+st.set_page_config(
+    page_title="AI Assistant Pro",
+    page_icon="🤖",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Startup timings shared by every session in this process
+@st.cache_resource
+def get_startup_report():
+    return StartupReport()
+
+startup_report = get_startup_report()
+startup_report.record("import core modules", import_seconds)
+
+# Load environment variables once per process
+@st.cache_resource
+def load_environment():
+    load_dotenv()
+
+with startup_report.measure("load .env"):
+    load_environment()
 
-# Load environment variables
-load_dotenv()
+# Remove chat spill logs left behind by sessions that ended long ago, once per process
+@st.cache_resource
+def clean_chat_spill_logs():
+    return purge_spill_logs()
+
+with startup_report.measure("clean chat spill logs"):
+    clean_chat_spill_logs()
 
 # Configure Gemini API with better error handling
 api_key = os.getenv("GOOGLE_API_KEY")
@@ -36,149 +89,269 @@ if not api_key:
     """)
     st.stop()
 
-try:
-    genai.configure(api_key=api_key)
-except Exception as e:
-    st.error(f"❌ **API Configuration Error:** {str(e)}")
-    st.markdown("Please check if your API key is valid and has the necessary permissions.")
-    st.stop()
+# The Gemini SDK is only imported and configured when a page first needs a model
+@st.cache_resource
+def configure_api(api_key):
+    genai = startup_report.import_module("google.generativeai")
+    with startup_report.measure("configure Gemini"):
+        genai.configure(api_key=api_key)
 
-# Page configuration
-st.set_page_config(
-    page_title="AI Assistant Pro",
-    page_icon="🤖",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+def ensure_api_configured():
+    try:
+        configure_api(api_key)
+    except Exception as e:
+        st.error(f"❌ **API Configuration Error:** {str(e)}")
+        st.markdown("Please check if your API key is valid and has the necessary permissions.")
+        st.stop()
 
-# Custom CSS for impressive UI
-st.markdown("""
-<style>
-    .main-header {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        padding: 2rem;
-        border-radius: 10px;
-        margin-bottom: 2rem;
-        text-align: center;
-        color: white;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    
-    .feature-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        border-left: 4px solid #667eea;
-        margin-bottom: 1rem;
-        transition: transform 0.2s;
-    }
-    
-    .feature-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.15);
-    }
-    
-    .stTextArea textarea {
-        border-radius: 10px;
-        border: 2px solid #e1e5e9;
-        padding: 1rem;
-    }
-    
-    .stTextArea textarea:focus {
-        border-color: #667eea;
-        box-shadow: 0 0 0 2px rgba(102, 126, 234, 0.2);
-    }
-    
-    .stButton button {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        border-radius: 25px;
-        padding: 0.5rem 2rem;
-        font-weight: 600;
-        transition: all 0.3s;
-    }
-    
-    .stButton button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-    }
-    
-    .sidebar .sidebar-content {
-        background: linear-gradient(180deg, #667eea 0%, #764ba2 100%);
-    }
-    
-    .output-container {
-        background: #f8f9fa;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border: 1px solid #e9ecef;
-        margin-top: 1rem;
-    }
-    
-    .chat-container {
-        max-height: 400px;
-        overflow-y: auto;
-        padding: 1rem;
-        background: #f8f9fa;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-    }
-    
-    .error-container {
-        background: #f8d7da;
-        color: #721c24;
-        padding: 1rem;
-        border-radius: 10px;
-        border: 1px solid #f5c6cb;
-        margin: 1rem 0;
-    }
-    
-    .success-container {
-        background: #d4edda;
-        color: #155724;
-        padding: 1rem;
-        border-radius: 10px;
-        border: 1px solid #c3e6cb;
-        margin: 1rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for impressive UI, read and minified once per process
+@st.cache_resource
+def load_css():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "style.css"), encoding="utf-8") as f:
+        css = f.read()
+    css = re.sub(r"\s*([{};])\s*", r"\1", re.sub(r"\s+", " ", css)).strip()
+    return f"<style>{css}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
+
+MODEL_NAME = DEFAULT_MODEL_NAME
 
-# Initialize Gemini model with error handling
+# Initialize Gemini models with error handling, lazily and once per model name
 @st.cache_resource
-def initialize_model():
+def initialize_model(model_name=MODEL_NAME):
     try:
-        return genai.GenerativeModel('gemini-2.0-flash-exp')
+        genai = startup_report.import_module("google.generativeai")
+        return genai.GenerativeModel(model_name)
     except Exception as e:
         st.error(f"❌ **Model Initialization Error:** {str(e)}")
         return None
 
-model = initialize_model()
+# Model factory for the router: configures the API and creates the model on first use
+def get_model(model_name=MODEL_NAME):
+    ensure_api_configured()
+    model = initialize_model(model_name)
+    if not model:
+        st.error("❌ **Failed to initialize AI model.** Please check your API key and try again.")
+        st.stop()
+    return model
 
-if not model:
-    st.error("❌ **Failed to initialize AI model.** Please check your API key and try again.")
-    st.stop()
+# Per-request telemetry shared by every session, optionally served at /metrics
+@st.cache_resource
+def get_telemetry():
+    telemetry = Telemetry()
+    if METRICS_PORT:
+        try:
+            start_metrics_server(telemetry, METRICS_PORT)
+        except OSError as e:
+            st.warning(f"⚠️ Metrics endpoint disabled: {str(e)}")
+    return telemetry
+
+telemetry = get_telemetry()
+
+# Chat histories, response cache and API quota shared with other replicas when SHARED_STATE_URL is set
+@st.cache_resource
+def get_shared_state():
+    try:
+        return open_backend()
+    except Exception as e:
+        st.warning(f"⚠️ Shared state disabled, using per-process state: {str(e)}")
+        return None
+
+shared_state = get_shared_state()
+
+# Rate limiter, retry policy and circuit breaker shared by every Gemini call in this process
+@st.cache_resource
+def get_resilience():
+    return ResiliencePolicy(telemetry=telemetry, bucket=shared_rate_limiter(shared_state))
+
+resilience = get_resilience()
+
+# Generation engine shared by every session in this process
+@st.cache_resource
+def get_engine():
+    return GenerationEngine(telemetry=telemetry, resilience=resilience)
+
+engine = get_engine()
+
+# Chat model with the system instruction set once, for native chat sessions
+@st.cache_resource
+def initialize_chat_model(model_name=MODEL_NAME):
+    ensure_api_configured()
+    try:
+        return create_chat_model(model_name)
+    except Exception as e:
+        st.error(f"❌ **Chat Model Initialization Error:** {str(e)}")
+        return None, False
+
+# Model router: fixed model per page or a cheap-first cascade with output validation
+@st.cache_resource
+def get_router():
+    return ModelRouter(get_model, telemetry=telemetry)
+
+router = get_router()
+
+# Response cache shared by every session and process on this machine
+@st.cache_resource
+def get_response_cache():
+    try:
+        if shared_state is not None:
+            return SharedResponseCache(shared_state)
+        return ResponseCache()
+    except Exception as e:
+        st.warning(f"⚠️ Response cache disabled: {str(e)}")
+        return None
+
+response_cache = get_response_cache()
+
+# Near-duplicate prompts reuse an answer; it sits in front of the exact cache and is only
+# built once matching is turned on, since it loads numpy
+@st.cache_resource
+def get_semantic_cache():
+    from semantic_cache import SemanticCache
+    return SemanticCache(exact=response_cache)
+
+# Translated paragraphs per language pair, so re-translating an edited text only sends what changed
+@st.cache_resource
+def get_translation_memory():
+    try:
+        return TranslationMemory()
+    except Exception as e:
+        st.warning(f"⚠️ Translation memory disabled: {str(e)}")
+        return None
+
+translation_memory = get_translation_memory()
+
+# Likely follow-up generations started in the background while the engine has spare capacity
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher(engine)
+
+prefetcher = get_prefetcher()
+
+# Feature logic shared with the headless API (api.py); the pages below only collect inputs and render results
+@st.cache_resource
+def get_assistant():
+    return Assistant(engine, router, response_cache, translation_memory=translation_memory, prefetcher=prefetcher)
+
+assistant = get_assistant()
 
-# Load Lottie animation
-def load_lottieurl(url):
+# Searchable archive of past chats and generations, written in batches off the script thread
+@st.cache_resource
+def get_history_store():
     try:
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200:
-            return None
-        return r.json()
+        return HistoryStore()
     except Exception as e:
-        st.warning(f"⚠️ Could not load animation: {str(e)}")
+        st.warning(f"⚠️ History archive disabled: {str(e)}")
         return None
 
+history_store = get_history_store()
+
+# Live chats by conversation id, so a chat link keeps working on any replica
+shared_chats = SharedChatLog(shared_state) if shared_state is not None else None
+
+# Bulk content jobs keep running in the background across reruns and sessions
+@st.cache_resource
+def get_job_manager():
+    return bulk_jobs.JobManager()
+
+# Lottie loader shared by every session, with memory and disk caches and a bundled fallback
+@st.cache_resource
+def get_lottie_loader():
+    return LottieLoader()
+
+# Render generated text inside the styled output container
+def render_output(placeholder, text):
+    placeholder.markdown(f"""
+    <div class="output-container">
+        {text}
+    </div>
+    """, unsafe_allow_html=True)
+
+# Show time-to-first-token and total generation time
+def show_timing(result, model_name=None):
+    via = f" · {model_name}" if model_name else ""
+    if result.prefetched:
+        st.caption(f"🔮 Ready from prefetch{via}")
+    elif result.cached:
+        st.caption(f"💾 Served from cache in {result.elapsed:.3f}s{via}")
+    elif result.ttft is not None:
+        st.caption(f"⚡ First token in {result.ttft:.2f}s · Total {result.elapsed:.2f}s{via}")
+    else:
+        st.caption(f"⏱️ Total {result.elapsed:.2f}s{via}")
+
+# Generated code per language as one ZIP, named like the single-language download
+def code_zip(codes):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for language, code in codes.items():
+            bundle.writestr(f"generated_code.{prompts.FILE_EXTENSIONS.get(language, 'txt')}", code)
+    return buffer.getvalue()
+
+def archive(feature, input_text, result):
+    # Cache hits repeat an output that is already archived; prefetched ones were never shown before
+    if history_store is not None and result.text and not result.cached:
+        history_store.add_generation(feature, input_text, result.text)
+
+# Store the newest message of `chat_history` in the archive and the shared chat log
+def save_chat_message(chat_history, role, content):
+    if history_store is not None:
+        history_store.add_message(chat_history.session_id, len(chat_history) - 1, role, content)
+    if shared_chats is not None:
+        shared_chats.append(chat_history.session_id, role, content)
+
+# Options for an `Assistant` call from this page's sidebar settings
+def ui_options(feature, on_chunk=None):
+    return dict(
+        model=model_choice, stream=stream_responses, on_chunk=on_chunk,
+        use_cache=feature in cached_features, semantic=semantic_matching, on_progress=show_progress
+    )
+
+# Progress bar for long inputs that are processed as parallel parts
+def show_progress(done, total):
+    if "bar" not in chunk_progress:
+        chunk_progress["bar"] = st.progress(0.0)
+    chunk_progress["bar"].progress(done / total, text=f"Processed {done}/{total} parts")
+    if done == total:
+        chunk_progress.pop("bar").empty()
+
+chunk_progress = {}
+
+# Server time spent showing one chat turn, excluding the model call
+def record_chat_render(path, seconds):
+    st.session_state.chat_render_times.append({"path": path, "seconds": seconds})
+
+# Response cache for a feature, unless the user opted that feature out
+def cache_for(feature):
+    return assistant.cache_for(feature, use_cache=feature in cached_features)
+
 # Initialize session state
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    # A chat link (?chat=<id>) restores the conversation on whichever replica serves the session
+    chat_id = st.query_params.get("chat", "")
+    if shared_chats is not None and re.fullmatch(r"[0-9a-f]{32}", chat_id) and chat_id in shared_chats:
+        st.session_state.chat_history = ChatHistory.from_messages(shared_chats.messages(chat_id), session_id=chat_id)
+    else:
+        st.session_state.chat_history = ChatHistory()
 
 if 'generated_content' not in st.session_state:
     st.session_state.generated_content = ""
 
+if 'last_ttft' not in st.session_state:
+    st.session_state.last_ttft = None
+
+if 'chat_memory' not in st.session_state:
+    st.session_state.chat_memory = ConversationMemory()
+
+if 'chat_render_times' not in st.session_state:
+    st.session_state.chat_render_times = []
+
+if 'chat_session' not in st.session_state:
+    st.session_state.chat_session = None
+    st.session_state.chat_session_model = None
+
 # Main header
 st.markdown("""
 <div class="main-header">
@@ -193,13 +366,17 @@ if api_key:
 else:
     st.sidebar.error("❌ API Not Connected")
 
+EXPLANATION_LEVELS = ["Beginner-friendly", "Technical", "Line-by-line"]
+
+CACHEABLE_FEATURES = ["Content Writer", "Translator", "Code Generator", "Code Explainer", "AI Chatbot"]
+
 # Sidebar navigation
 with st.sidebar:
     st.markdown("### 🚀 Navigation")
     selected = option_menu(
         menu_title=None,
-        options=["🏠 Home", "✍️ Content Writer", "🌐 Translator", "💻 Code Assistant", "💬 AI Chatbot"],
-        icons=["house", "pencil", "translate", "code-slash", "chat"],
+        options=["🏠 Home", "✍️ Content Writer", "🌐 Translator", "💻 Code Assistant", "💬 AI Chatbot", "🔎 Search", "📊 Metrics"],
+        icons=["house", "pencil", "translate", "code-slash", "chat", "search", "bar-chart"],
         menu_icon="cast",
         default_index=0,
         styles={
@@ -217,8 +394,55 @@ with st.sidebar:
         }
     )
 
+    st.markdown("### ⚙️ Settings")
+    stream_responses = st.toggle("⚡ Stream responses", value=True, help="Show text as it is generated")
+    model_choice = st.selectbox(
+        "🧭 Model for this page:", ROUTER_MODELS + [CASCADE], key=f"model_choice_{selected}",
+        help="Cascade tries a fast, cheap model first and escalates only when its output fails validation"
+    )
+    prefetch_followups = st.toggle(
+        "🔮 Prefetch likely follow-ups", value=False,
+        help="After a generation, start the usual next request in the background (other lengths in the "
+             "Content Writer, an explanation of generated code) so that click returns instantly"
+    )
+    
+    with st.expander("💾 Response Cache"):
+        cached_features = st.multiselect(
+            "Cache responses for:",
+            CACHEABLE_FEATURES,
+            default=CACHEABLE_FEATURES,
+            help="Identical requests are answered from the cache instead of calling Gemini"
+        )
+        semantic_matching = st.checkbox(
+            "🧠 Match near-duplicate questions", value=False,
+            help=f"Reuse answers for reworded requests in: {', '.join(SEMANTIC_FEATURES)}"
+        )
+        cache_stats = st.empty()
+        if st.button("🧹 Clear Cache", key="clear_cache"):
+            if response_cache is not None:
+                response_cache.clear()
+            if assistant.semantic_cache is not None:
+                assistant.semantic_cache.clear()
+            if translation_memory is not None:
+                translation_memory.clear()
+
+if semantic_matching and assistant.semantic_cache is None:
+    assistant.semantic_cache = get_semantic_cache()
+
+# Model used for helper calls (chunks, summaries, batches); the first cascade step when cascading.
+# It is created by the page that needs it, so the Home page never loads the Gemini SDK.
+page_model_name = CASCADE_MODELS[0] if model_choice == CASCADE else model_choice
+
+# Seconds after which the script reruns itself once this run has rendered, e.g. to follow a bulk job
+refresh_after = None
+
 # Home Page
 if selected == "🏠 Home":
+    lottie_url = "https://assets5.lottiefiles.com/packages/lf20_fcfjwiyb.json"
+    lottie_loader = get_lottie_loader()
+    # Start the download before rendering so the feature cards never wait on the CDN
+    lottie_loader.prefetch(lottie_url)
+    
     col1, col2 = st.columns([2, 1])
     
     with col1:
@@ -245,10 +469,11 @@ if selected == "🏠 Home":
             """, unsafe_allow_html=True)
     
     with col2:
-        lottie_url = "https://assets5.lottiefiles.com/packages/lf20_fcfjwiyb.json"
-        lottie_json = load_lottieurl(lottie_url)
+        lottie_json, lottie_source, lottie_seconds = lottie_loader.load(lottie_url)
         if lottie_json:
+            st_lottie = startup_report.import_module("streamlit_lottie").st_lottie
             st_lottie(lottie_json, height=300)
+        st.caption(f"🎞️ Animation loaded from {lottie_source} in {lottie_seconds * 1000:.0f} ms")
 
 # Content Writer
 elif selected == "✍️ Content Writer":
@@ -262,17 +487,17 @@ elif selected == "✍️ Content Writer":
         
         content_type = st.selectbox(
             "📊 Select content type:",
-            ["Blog Post", "Article", "Social Media Post", "Product Description", "Email", "Essay"]
+            prompts.CONTENT_TYPES
         )
         
         length = st.selectbox(
             "📏 Select content length:",
-            ["Short (100-200 words)", "Medium (300-500 words)", "Long (800-1200 words)"]
+            prompts.CONTENT_LENGTHS
         )
         
         tone = st.selectbox(
             "🎭 Select tone:",
-            ["Professional", "Casual", "Friendly", "Formal", "Creative", "Persuasive"]
+            prompts.TONES
         )
     
     with col2:
@@ -282,30 +507,29 @@ elif selected == "✍️ Content Writer":
     if st.button("🚀 Generate Content", key="content_gen"):
         if topic:
             with st.spinner("🤖 AI is crafting your content..."):
-                prompt = f"""
-                Create a {content_type.lower()} about "{topic}" with the following specifications:
-                - Length: {length}
-                - Tone: {tone}
-                - Make it engaging, well-structured, and informative
-                - Include relevant examples where appropriate
-                """
-                
                 try:
-                    response = model.generate_content(prompt)
-                    if response and response.text:
-                        st.session_state.generated_content = response.text
+                    st.markdown("### 📄 Generated Content:")
+                    output = st.empty()
+                    result, used_model = assistant.write_content(
+                        topic, content_type, length, tone,
+                        **ui_options("Content Writer", lambda text: render_output(output, text))
+                    )
+                    if result.text:
+                        st.session_state.generated_content = result.text
+                        archive("Content Writer", f"{content_type} · {length} · {tone}: {topic}", result)
                         
-                        st.markdown("### 📄 Generated Content:")
-                        st.markdown(f"""
-                        <div class="output-container">
-                            {response.text}
-                        </div>
-                        """, unsafe_allow_html=True)
+                        render_output(output, result.text)
+                        show_timing(result, used_model)
+                        if prefetch_followups:
+                            assistant.prefetch_content_variants(
+                                st.session_state.session_id, topic, content_type, length, tone,
+                                **ui_options("Content Writer")
+                            )
                         
                         # Download button
                         st.download_button(
                             label="📥 Download Content",
-                            data=response.text,
+                            data=result.text,
                             file_name=f"{topic.replace(' ', '_')}_content.txt",
                             mime="text/plain"
                         )
@@ -320,6 +544,75 @@ elif selected == "✍️ Content Writer":
                     st.markdown("- Try a simpler topic")
         else:
             st.warning("⚠️ Please enter a topic to generate content.")
+    
+    # Bulk generation
+    st.markdown("---")
+    with st.expander("📦 Bulk Generation"):
+        st.markdown(
+            "Upload a CSV with a `topic` column and optional `content type`, `length` and `tone` columns. "
+            "Interrupted jobs resume where they stopped when the same file is uploaded again."
+        )
+        
+        bulk_file = st.file_uploader("Upload topics CSV:", type=["csv"], key="bulk_file")
+        bulk_parallelism = st.slider(
+            "Parallel generations:", min_value=1, max_value=16, value=bulk_jobs.BULK_PARALLELISM
+        )
+        
+        job_manager = get_job_manager()
+        
+        if st.button("🚀 Start Bulk Job", key="bulk_start"):
+            if bulk_file:
+                try:
+                    bulk_rows = bulk_jobs.read_rows(bulk_file.getvalue(), content_type, length, tone)
+                    if bulk_rows:
+                        job = job_manager.start(
+                            bulk_rows, engine, router.get(page_model_name), bulk_parallelism, cache=cache_for("Content Writer")
+                        )
+                        st.session_state.bulk_job_id = job.id
+                    else:
+                        st.warning("⚠️ No topics found in the uploaded file.")
+                except Exception as e:
+                    st.error(f"❌ Could not start bulk job: {str(e)}")
+            else:
+                st.warning("⚠️ Please upload a CSV of topics.")
+        
+        job = job_manager.get(st.session_state.get("bulk_job_id"))
+        if job:
+            completed = job.completed()
+            failed = job.failed()
+            finished = len(completed) + len(failed)
+            st.progress(min(1.0, finished / len(job.rows)), text=f"{finished}/{len(job.rows)} rows")
+            st.caption(f"Job `{job.id}` · {job.state} · ✅ {len(completed)} done · ❌ {len(failed)} failed")
+            if completed:
+                st.caption(f"Latest: {completed[-1]['topic']}")
+            if job.running:
+                # Rerun after this page has rendered, so finished pieces can be downloaded while the job runs;
+                # navigating away simply stops watching
+                refresh_after = bulk_jobs.BULK_REFRESH_SECONDS
+            
+            if job.error:
+                st.error(f"❌ Bulk job error: {job.error}")
+            if failed:
+                with st.expander(f"❌ {len(failed)} failed rows (start the job again to retry them)"):
+                    for item in failed:
+                        st.caption(f"Row {item['index'] + 1} · {item['topic']}: {item['error']}")
+            
+            if completed:
+                download_col1, download_col2 = st.columns(2)
+                with download_col1:
+                    st.download_button(
+                        label=f"📥 Download ZIP ({len(completed)} done)",
+                        data=job.to_zip(),
+                        file_name=f"bulk_content_{job.id}.zip",
+                        mime="application/zip"
+                    )
+                with download_col2:
+                    st.download_button(
+                        label=f"📥 Download JSONL ({len(completed)} done)",
+                        data=job.to_jsonl(),
+                        file_name=f"bulk_content_{job.id}.jsonl",
+                        mime="application/jsonl"
+                    )
 
 # Translator
 elif selected == "🌐 Translator":
@@ -353,20 +646,24 @@ elif selected == "🌐 Translator":
         if st.button("🔄 Translate", key="translate"):
             if text_to_translate:
                 with st.spinner("🌐 Translating..."):
-                    prompt = f"""
-                    Translate the following text from {source_lang} to {target_lang}.
-                    Provide an accurate and natural translation:
-                    
-                    Text: {text_to_translate}
-                    """
-                    
                     try:
-                        response = model.generate_content(prompt)
-                        if response and response.text:
-                            translated_text = response.text
+                        output = st.empty()
+                        segment_stats = []
+                        result, used_model = assistant.translate(
+                            text_to_translate, source_lang, target_lang,
+                            on_segments=lambda reused, total: segment_stats.append((reused, total)),
+                            **ui_options("Translator", lambda text: output.markdown(text))
+                        )
+                        if result.text:
+                            translated_text = result.text
+                            archive("Translator", f"{source_lang} → {target_lang}: {text_to_translate}", result)
                             
-                            st.text_area("Translated text:", value=translated_text, height=200, key="translated")
+                            output.text_area("Translated text:", value=translated_text, height=200, key="translated")
                             st.success("✅ Translation completed!")
+                            show_timing(result, used_model)
+                            if segment_stats and segment_stats[0][0]:
+                                reused, total = segment_stats[0]
+                                st.caption(f"♻️ Reused {reused} of {total} paragraphs from translation memory")
                         else:
                             st.error("❌ Translation failed. Please try again.")
                         
@@ -378,6 +675,95 @@ elif selected == "🌐 Translator":
                         st.markdown("- Verify your API key")
             else:
                 st.warning("⚠️ Please enter text to translate.")
+    
+    # Batch translation
+    st.markdown("---")
+    with st.expander("📦 Batch Translation"):
+        st.markdown("Upload many segments and translate them into several languages in one pass.")
+        
+        uploaded_file = st.file_uploader(
+            "Upload segments (CSV with a `text` column, JSONL or one segment per line TXT):",
+            type=["csv", "jsonl", "txt"],
+            key="batch_file"
+        )
+        
+        batch_col1, batch_col2 = st.columns(2)
+        with batch_col1:
+            batch_source = st.selectbox("From Language:", list(languages.keys()), key="batch_source")
+            batch_targets = st.multiselect(
+                "To Languages:",
+                [lang for lang in languages if lang != batch_source],
+                key="batch_targets"
+            )
+        with batch_col2:
+            batch_max_chars = st.number_input(
+                "Max characters per request:", min_value=500, max_value=20000,
+                value=batch_translate.BATCH_MAX_CHARS, step=500
+            )
+            batch_concurrency = st.slider(
+                "Parallel requests:", min_value=1, max_value=16,
+                value=batch_translate.BATCH_CONCURRENCY
+            )
+        
+        if st.button("📦 Translate Batch", key="translate_batch"):
+            if uploaded_file and batch_targets:
+                try:
+                    segments = batch_translate.read_segments(uploaded_file.name, uploaded_file.getvalue())
+                except Exception as e:
+                    segments = []
+                    st.error(f"❌ Could not read file: {str(e)}")
+                
+                if segments:
+                    progress = st.progress(0.0, text=f"Translating {len(segments)} segments...")
+                    start = time.perf_counter()
+                    try:
+                        results = batch_translate.translate_segments(
+                            router.get(page_model_name), segments, batch_source, batch_targets,
+                            max_chars=batch_max_chars,
+                            concurrency=batch_concurrency,
+                            cache=cache_for("Translator"),
+                            engine=engine,
+                            on_progress=lambda done, total: progress.progress(
+                                done / total, text=f"Translated {done}/{total} batches"
+                            )
+                        )
+                        st.success(
+                            f"✅ Translated {len(segments)} segments into {len(batch_targets)} "
+                            f"languages in {time.perf_counter() - start:.1f}s"
+                        )
+                        
+                        download_col1, download_col2, download_col3 = st.columns(3)
+                        with download_col1:
+                            st.download_button(
+                                label="📥 Download CSV",
+                                data=batch_translate.to_csv(segments, results),
+                                file_name="translations.csv",
+                                mime="text/csv"
+                            )
+                        with download_col2:
+                            st.download_button(
+                                label="📥 Download JSONL",
+                                data=batch_translate.to_jsonl(segments, results, languages),
+                                file_name="translations.jsonl",
+                                mime="application/jsonl"
+                            )
+                        with download_col3:
+                            st.download_button(
+                                label="📥 Download TXT (ZIP)",
+                                data=batch_translate.to_zip(results, languages),
+                                file_name="translations.zip",
+                                mime="application/zip"
+                            )
+                    except Exception as e:
+                        st.error(f"❌ Batch translation error: {str(e)}")
+                        st.markdown("**Possible solutions:**")
+                        st.markdown("- Lower the parallel requests to stay within your quota")
+                        st.markdown("- Reduce the characters per request")
+                        st.markdown("- Check your internet connection")
+                elif uploaded_file:
+                    st.warning("⚠️ No segments found in the uploaded file.")
+            else:
+                st.warning("⚠️ Please upload a file and pick at least one target language.")
 
 # Code Assistant
 elif selected == "💻 Code Assistant":
@@ -392,10 +778,21 @@ elif selected == "💻 Code Assistant":
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            programming_lang = st.selectbox(
-                "Select Programming Language:",
-                ["Python", "JavaScript", "Java", "C++", "C#", "Go", "Rust", "PHP", "Ruby", "Swift"]
+            multi_language = st.toggle(
+                "🔀 Several languages at once", key="code_multi_language",
+                help="Generate the same description in each selected language in parallel, e.g. for porting"
             )
+            if multi_language:
+                code_languages = st.multiselect(
+                    "Select Programming Languages:", prompts.PROGRAMMING_LANGUAGES, default=["Python", "JavaScript"]
+                )
+                programming_lang = code_languages[0] if code_languages else prompts.PROGRAMMING_LANGUAGES[0]
+            else:
+                programming_lang = st.selectbox(
+                    "Select Programming Language:",
+                    prompts.PROGRAMMING_LANGUAGES
+                )
+                code_languages = [programming_lang]
             
             code_description = st.text_area(
                 "Describe what you want the code to do:",
@@ -415,38 +812,74 @@ elif selected == "💻 Code Assistant":
             include_error_handling = st.checkbox("Include error handling")
         
         if st.button("🚀 Generate Code", key="code_gen"):
-            if code_description:
+            if not code_languages:
+                st.warning("⚠️ Please select at least one language.")
+            elif code_description and len(code_languages) > 1:
+                # All languages are requested at once; each tab fills in as its code arrives
+                st.markdown("### 📝 Generated Code:")
+                outputs = {}
+                for language, tab in zip(code_languages, st.tabs(code_languages)):
+                    with tab:
+                        outputs[language] = st.empty()
+                        outputs[language].info("⏳ Generating...")
+                codes = {}
+                sequential_seconds = 0.0
+                start = time.perf_counter()
+                with st.spinner(f"💻 Generating code in {len(code_languages)} languages..."):
+                    for language, result, used_model, error in assistant.generate_code_many(
+                        code_description, code_languages, complexity,
+                        include_comments, include_examples, include_error_handling,
+                        **ui_options("Code Generator")
+                    ):
+                        with outputs[language].container():
+                            if error is not None:
+                                st.error(f"❌ Code generation error: {str(error)}")
+                            elif not result.text:
+                                st.error("❌ Code generation failed. Please try again.")
+                            else:
+                                st.code(result.text, language=language.lower())
+                                show_timing(result, used_model)
+                                archive("Code Generator", f"{language}: {code_description}", result)
+                                codes[language] = result.text
+                                sequential_seconds += result.elapsed
+                if codes:
+                    st.caption(
+                        f"⚡ {len(codes)} languages in {time.perf_counter() - start:.2f}s "
+                        f"({sequential_seconds:.2f}s of generation time in total)"
+                    )
+                    st.download_button(
+                        label="📥 Download All (ZIP)",
+                        data=code_zip(codes),
+                        file_name="generated_code.zip",
+                        mime="application/zip"
+                    )
+            elif code_description:
                 with st.spinner("💻 Generating code..."):
-                    prompt = f"""
-                    Generate {programming_lang} code for the following requirement:
-                    {code_description}
-                    
-                    Requirements:
-                    - Complexity level: {complexity}
-                    - Include comments: {include_comments}
-                    - Include usage examples: {include_examples}
-                    - Include error handling: {include_error_handling}
-                    
-                    Provide clean, well-structured, and efficient code.
-                    """
-                    
                     try:
-                        response = model.generate_content(prompt)
-                        if response and response.text:
-                            st.markdown("### 📝 Generated Code:")
-                            st.code(response.text, language=programming_lang.lower())
+                        st.markdown("### 📝 Generated Code:")
+                        output = st.empty()
+                        result, used_model = assistant.generate_code(
+                            code_description, programming_lang, complexity,
+                            include_comments, include_examples, include_error_handling,
+                            **ui_options("Code Generator", lambda text: output.code(text, language=programming_lang.lower()))
+                        )
+                        if result.text:
+                            output.code(result.text, language=programming_lang.lower())
+                            show_timing(result, used_model)
+                            archive("Code Generator", f"{programming_lang}: {code_description}", result)
+                            if prefetch_followups:
+                                # The explainer tab's level is only known once it has rendered, so use its last value
+                                assistant.prefetch_explanation(
+                                    st.session_state.session_id, result.text,
+                                    st.session_state.get("explanation_level", EXPLANATION_LEVELS[0]),
+                                    **ui_options("Code Explainer")
+                                )
                             
                             # Download button
-                            file_extension = {
-                                "Python": "py", "JavaScript": "js", "Java": "java",
-                                "C++": "cpp", "C#": "cs", "Go": "go", "Rust": "rs",
-                                "PHP": "php", "Ruby": "rb", "Swift": "swift"
-                            }
-                            
                             st.download_button(
                                 label="📥 Download Code",
-                                data=response.text,
-                                file_name=f"generated_code.{file_extension.get(programming_lang, 'txt')}",
+                                data=result.text,
+                                file_name=f"generated_code.{prompts.FILE_EXTENSIONS.get(programming_lang, 'txt')}",
                                 mime="text/plain"
                             )
                         else:
@@ -472,33 +905,24 @@ elif selected == "💻 Code Assistant":
         
         explanation_level = st.selectbox(
             "Explanation Level:",
-            ["Beginner-friendly", "Technical", "Line-by-line"]
+            EXPLANATION_LEVELS,
+            key="explanation_level"
         )
         
         if st.button("🔍 Explain Code", key="code_explain"):
             if code_to_explain:
                 with st.spinner("🤔 Analyzing code..."):
-                    prompt = f"""
-                    Explain the following code in a {explanation_level.lower()} manner:
-                    
-                    {code_to_explain}
-                    
-                    Please provide:
-                    1. Overall purpose of the code
-                    2. How it works
-                    3. Key concepts used
-                    4. Any potential improvements
-                    """
-                    
                     try:
-                        response = model.generate_content(prompt)
-                        if response and response.text:
-                            st.markdown("### 📚 Code Explanation:")
-                            st.markdown(f"""
-                            <div class="output-container">
-                                {response.text}
-                            </div>
-                            """, unsafe_allow_html=True)
+                        st.markdown("### 📚 Code Explanation:")
+                        output = st.empty()
+                        result, used_model = assistant.explain_code(
+                            code_to_explain, explanation_level,
+                            **ui_options("Code Explainer", lambda text: render_output(output, text))
+                        )
+                        if result.text:
+                            render_output(output, result.text)
+                            show_timing(result, used_model)
+                            archive("Code Explainer", code_to_explain, result)
                         else:
                             st.error("❌ Code explanation failed. Please try again.")
                         
@@ -515,86 +939,481 @@ elif selected == "💬 AI Chatbot":
     st.markdown("## 💬 AI Chatbot")
     st.markdown("Have intelligent conversations with our advanced AI assistant.")
     
-    # Chat interface
-    chat_container = st.container()
+    chat_memory = st.session_state.chat_memory
+    if shared_chats is not None:
+        st.query_params["chat"] = st.session_state.chat_history.session_id
+    with st.expander("🧠 Memory Settings"):
+        chat_mode = st.radio(
+            "Chat backend:", CHAT_MODES, horizontal=True, key="chat_mode",
+            help="Flattened mode re-sends a text transcript each turn; native mode keeps a structured chat session"
+        )
+        chat_memory.token_budget = st.number_input(
+            "Context token budget:", min_value=200, max_value=32000,
+            value=chat_memory.token_budget or CHAT_TOKEN_BUDGET, step=100,
+            help="Recent messages are sent verbatim up to this budget; older ones are summarized"
+        )
+        incremental_chat = st.toggle(
+            "⚡ Incremental rendering", value=True, key="incremental_chat",
+            help="Append new messages to the chat instead of re-running the whole page after each reply"
+        )
+        if chat_memory.summary:
+            st.markdown("**Summary of earlier conversation:**")
+            st.caption(chat_memory.summary)
+    
+    # With incremental rendering only the chat panel (a fragment) reruns when a message is sent
+    render_path = "fragment" if incremental_chat else "full rerun"
     
-    with chat_container:
-        st.markdown('<div class="chat-container">', unsafe_allow_html=True)
+    def render_chat_panel():
+        # A fragment rerun only runs this function, so its render time starts here
+        render_start = time.perf_counter() if render_path == "fragment" else script_start
+        render_turn = None
         
-        # Display chat history
-        for i, (role, content) in enumerate(st.session_state.chat_history):
-            if role == "user":
-                message(content, is_user=True, key=f"user_{i}")
-            else:
-                message(content, key=f"bot_{i}")
+        message = startup_report.import_module("streamlit_chat").message
+    
+        # Render one page of the history; older messages stay on disk until paged to
+        chat_history = st.session_state.chat_history
+        chat_page = 0
+        if chat_history.page_count() > 1:
+            chat_page = st.slider(
+                "📜 Pages back:", 0, chat_history.page_count() - 1, 0, key="chat_page",
+                help="0 shows the latest messages"
+            )
+        visible_messages = chat_history.page(chat_page)
+        if visible_messages and len(chat_history) > len(visible_messages):
+            st.caption(
+                f"Showing messages {visible_messages[0][0] + 1}-{visible_messages[-1][0] + 1} of {len(chat_history)}"
+            )
+    
+        # Chat interface
+        chat_container = st.container()
+    
+        with chat_container:
+            st.markdown('<div class="chat-container">', unsafe_allow_html=True)
         
-        st.markdown('</div>', unsafe_allow_html=True)
+            # Display chat history
+            for i, role, content in visible_messages:
+                if role == "user":
+                    message(content, is_user=True, key=f"user_{i}")
+                else:
+                    message(content, key=f"bot_{i}")
+        
+            st.markdown('</div>', unsafe_allow_html=True)
     
-    # Chat input
-    col1, col2 = st.columns([4, 1])
+        # Chat input
+        col1, col2 = st.columns([4, 1])
     
-    with col1:
-        user_input = st.text_input("💭 Type your message:", placeholder="Ask me anything...", key="chat_input")
+        with col1:
+            user_input = st.text_input("💭 Type your message:", placeholder="Ask me anything...", key="chat_input")
     
-    with col2:
-        send_button = st.button("📤 Send", key="send_chat")
-    
-    # Process chat
-    if send_button and user_input:
-        # Add user message to history
-        st.session_state.chat_history.append(("user", user_input))
-        
-        with st.spinner("🤖 AI is thinking..."):
-            try:
-                # Create context-aware prompt
-                context = "\n".join([f"{role}: {content}" for role, content in st.session_state.chat_history[-5:]])
-                prompt = f"""
-                You are a helpful AI assistant. Respond to the user's message in a friendly and informative way.
-                
-                Recent conversation:
-                {context}
-                
-                Please provide a helpful response to the latest user message.
-                """
-                
-                response = model.generate_content(prompt)
-                if response and response.text:
-                    bot_response = response.text
+        with col2:
+            send_button = st.button("📤 Send", key="send_chat")
+    
+        # Process chat
+        if send_button and user_input:
+            # Add user message to history
+            chat_history.append("user", user_input)
+            save_chat_message(chat_history, "user", user_input)
+            # On the latest page the new messages are appended below the ones already shown
+            append_inline = incremental_chat and chat_page == 0
+            if append_inline:
+                with chat_container:
+                    message(user_input, is_user=True, key=f"user_{len(chat_history) - 1}")
+        
+            with st.spinner("🤖 AI is thinking..."):
+                try:
+                    model_start = time.perf_counter()
+                    if chat_mode == NATIVE_MODE:
+                        # Native session: send only the new message on the structured chat
+                        # A session started on another model is rebuilt from the history
+                        if st.session_state.chat_session is None or st.session_state.chat_session_model != page_model_name:
+                            chat_model, has_system_instruction = initialize_chat_model(page_model_name)
+                            st.session_state.chat_session_model = page_model_name
+                            st.session_state.chat_session = NativeChatSession(
+                                chat_model, has_system_instruction, chat_history[:-1]
+                            )
+                        chat_session = st.session_state.chat_session
+                        turn_stats = chat_memory.record(chat_session.prompt_tokens(user_input), mode=chat_mode)
+                        with chat_container:
+                            output = st.empty()
+                        result = engine.generate(
+                            chat_session, user_input, stream=stream_responses,
+                            on_chunk=lambda text: output.markdown(f"🤖 {text}"),
+                            feature="AI Chatbot"
+                        )
+                    else:
+                        # A native session started earlier no longer matches this history
+                        st.session_state.chat_session = None
+                        with chat_container:
+                            output = st.empty()
+                        # Context-aware prompt within the memory's token budget, routed like the other pages
+                        result, _ = assistant.chat(
+                            chat_history, chat_memory, mode=chat_mode,
+                            **ui_options("AI Chatbot", lambda text: output.markdown(f"🤖 {text}"))
+                        )
+                        turn_stats = chat_memory.turn_stats[-1]
+                    model_seconds = time.perf_counter() - model_start
+                    turn_stats["latency"] = result.elapsed
+                    if result.text:
+                        bot_response = result.text
+                        st.session_state.last_ttft = result.ttft
                     
-                    # Add bot response to history
-                    st.session_state.chat_history.append(("assistant", bot_response))
+                        # Add bot response to history
+                        chat_history.append("assistant", bot_response)
+                        save_chat_message(chat_history, "assistant", bot_response)
                     
-                    # Rerun to update chat display
-                    st.rerun()
-                else:
-                    st.error("❌ Failed to get response. Please try again.")
+                        if append_inline:
+                            with output.container():
+                                message(bot_response, key=f"bot_{len(chat_history) - 1}")
+                            render_turn = {"path": render_path, "start": render_start, "model_seconds": model_seconds}
+                        else:
+                            # Rerun to update chat display; the next run finishes timing this turn
+                            st.session_state.chat_render_pending = {
+                                "path": "full rerun",
+                                "seconds": time.perf_counter() - script_start - model_seconds,
+                            }
+                            st.rerun()
+                    else:
+                        st.error("❌ Failed to get response. Please try again.")
                 
-            except Exception as e:
-                st.error(f"❌ Chat error: {str(e)}")
-                st.markdown("**Try:**")
-                st.markdown("- Asking a simpler question")
-                st.markdown("- Checking your connection")
-    
-    # Clear chat button
-    if st.button("🗑️ Clear Chat", key="clear_chat"):
-        st.session_state.chat_history = []
-        st.rerun()
-    
-    # Chat statistics
-    if st.session_state.chat_history:
-        st.markdown("---")
-        col1, col2, col3 = st.columns(3)
+                except Exception as e:
+                    st.error(f"❌ Chat error: {str(e)}")
+                    st.markdown("**Try:**")
+                    st.markdown("- Asking a simpler question")
+                    st.markdown("- Checking your connection")
+    
+        # Clear chat button
+        if st.button("🗑️ Clear Chat", key="clear_chat"):
+            # The archived conversation stays searchable; new messages start a new one
+            chat_history.clear()
+            st.session_state.chat_history = ChatHistory()
+            st.session_state.chat_session = None
+            st.session_state.chat_render_times = []
+            chat_memory.reset()
+            st.rerun()
+    
+        # Chat statistics
+        if chat_history:
+            st.markdown("---")
+            col1, col2, col3 = st.columns(3)
+        
+            with col1:
+                st.metric("💬 Total Messages", len(chat_history))
+        
+            with col2:
+                st.metric("👤 Your Messages", chat_history.counts["user"])
+        
+            with col3:
+                st.metric("🤖 AI Responses", chat_history.counts["assistant"])
+        
+            if st.session_state.last_ttft is not None:
+                st.caption(f"⚡ Last response: first token in {st.session_state.last_ttft:.2f}s")
+        
+            if chat_memory.turn_stats:
+                last_turn = chat_memory.turn_stats[-1]
+                if last_turn["mode"] == NATIVE_MODE:
+                    st.caption(f"📏 Last prompt: ~{last_turn['prompt_tokens']} tokens (native chat session)")
+                else:
+                    st.caption(
+                        f"📏 Last prompt: ~{last_turn['prompt_tokens']} tokens "
+                        f"({last_turn['recent_turns']} recent messages, {last_turn['summary_tokens']} summary tokens)"
+                    )
+                with st.expander("📈 Prompt tokens per turn"):
+                    render_times = st.session_state.chat_render_times
+                    if render_times:
+                        # Server time per turn outside the model call, by how the new messages were shown
+                        for path in sorted({turn["path"] for turn in render_times}):
+                            seconds = [turn["seconds"] for turn in render_times if turn["path"] == path]
+                            st.caption(
+                                f"🖥️ **{path}:** {len(seconds)} turns · "
+                                f"{sum(seconds) / len(seconds) * 1000:.0f} ms average render time"
+                            )
+                    st.line_chart(
+                        {"Prompt tokens": [turn["prompt_tokens"] for turn in chat_memory.turn_stats]}
+                    )
+                    # Compare the two chat backends on the turns measured so far
+                    for mode in CHAT_MODES:
+                        turns = [turn for turn in chat_memory.turn_stats if turn["mode"] == mode and turn["latency"]]
+                        if turns:
+                            avg_tokens = sum(turn["prompt_tokens"] for turn in turns) / len(turns)
+                            avg_latency = sum(turn["latency"] for turn in turns) / len(turns)
+                            st.caption(
+                                f"**{mode}:** {len(turns)} turns · ~{avg_tokens:.0f} prompt tokens · {avg_latency:.2f}s average"
+                            )
         
+        if render_turn is not None:
+            record_chat_render(
+                render_turn["path"],
+                time.perf_counter() - render_turn["start"] - render_turn["model_seconds"]
+            )
+        pending = st.session_state.pop("chat_render_pending", None)
+        if pending is not None:
+            record_chat_render(pending["path"], pending["seconds"] + time.perf_counter() - script_start)
+    
+    if render_path == "fragment":
+        render_chat_panel = st.fragment(render_chat_panel)
+    render_chat_panel()
+
+# Search across archived chats and generations
+elif selected == "🔎 Search":
+    st.markdown("## 🔎 Search History")
+    st.markdown("Find past conversations and generated content, and reopen chats without regenerating anything.")
+    
+    def reopen_chat(conversation_id):
+        # Continue the archived conversation: new messages are appended to it
+        messages = history_store.conversation(conversation_id)
+        st.session_state.chat_history = ChatHistory.from_messages(messages, session_id=conversation_id)
+        if shared_chats is not None:
+            shared_chats.replace(conversation_id, messages)
+        st.session_state.chat_session = None
+        st.session_state.chat_memory.reset()
+        st.success("✅ Chat restored. Open 💬 AI Chatbot to continue it.")
+    
+    if history_store is None:
+        st.warning("⚠️ The history archive is not available.")
+    else:
+        col1, col2 = st.columns([3, 1])
         with col1:
-            st.metric("💬 Total Messages", len(st.session_state.chat_history))
+            search_text = st.text_input("🔍 Keywords:", placeholder="e.g. python decorators", key="search_text")
+        with col2:
+            search_kind = st.selectbox("In:", ["Everything", "Chats", "Generations"], key="search_kind")
+        
+        if search_text:
+            history_store.flush()
+            search_start = time.perf_counter()
+            results = history_store.search(
+                search_text, kind={"Chats": "chat", "Generations": "generation"}.get(search_kind)
+            )
+            st.caption(f"{len(results)} results in {(time.perf_counter() - search_start) * 1000:.1f} ms")
+            
+            for i, hit in enumerate(results):
+                when = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit["created_at"]))
+                if hit["kind"] == "chat":
+                    # The store returns one entry per conversation, at its best matching message
+                    with st.expander(f"💬 Chat · {when}"):
+                        st.markdown(hit["snippet"])
+                        if st.button("↩️ Reopen this chat", key=f"reopen_{hit['id']}"):
+                            reopen_chat(hit["id"])
+                else:
+                    with st.expander(f"📄 {hit['feature']} · {when}"):
+                        st.markdown(hit["snippet"])
+                        generation = None
+                        if st.checkbox("Show full output", key=f"show_generation_{i}"):
+                            generation = history_store.generation(hit["id"])
+                        if generation is not None:
+                            st.caption(generation["input"][:300])
+                            st.markdown(generation["output"])
+                            st.download_button(
+                                label="📥 Download",
+                                data=generation["output"],
+                                file_name=f"{generation['feature'].lower().replace(' ', '_')}_{generation['id']}.txt",
+                                mime="text/plain",
+                                key=f"download_generation_{i}"
+                            )
+        else:
+            st.markdown("### 🕘 Recent Chats")
+            conversations = history_store.recent_conversations()
+            if not conversations:
+                st.info("No archived chats yet.")
+            for conversation in conversations:
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(conversation["updated_at"]))
+                    st.markdown(f"**{conversation['title']}**  \n{conversation['messages']} messages · {when}")
+                with col2:
+                    if st.button("↩️ Reopen", key=f"reopen_recent_{conversation['id']}"):
+                        reopen_chat(conversation["id"])
+        
+        stats = history_store.stats()
+        st.caption(
+            f"🗄️ Archive: {stats['conversations']} chats · {stats['messages']} messages · "
+            f"{stats['generations']} generations"
+        )
+
+# Metrics dashboard
+elif selected == "📊 Metrics":
+    st.markdown("## 📊 Metrics")
+    st.markdown("Latency, token and error telemetry for every model call served by this process.")
+    
+    records = telemetry.snapshot()
+    if not records:
+        st.info("No model calls recorded yet. Use any feature to start collecting metrics.")
+    else:
+        features = sorted({record["feature"] for record in records})
+        selected_features = st.multiselect("Features:", features, default=features)
+        records = [record for record in records if record["feature"] in selected_features]
+        
+        errors = [record for record in records if record["error"]]
+        cache_hits = [record for record in records if record["cache"] == "hit"]
+        cache_lookups = [record for record in records if record["cache"] not in ("off", "prefetch")]
+        latencies = sorted(record["elapsed"] for record in records)
         
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("📨 Requests", len(records))
         with col2:
-            user_messages = len([msg for role, msg in st.session_state.chat_history if role == "user"])
-            st.metric("👤 Your Messages", user_messages)
+            st.metric("⏱️ Median Latency", f"{latencies[len(latencies) // 2]:.2f}s" if latencies else "–")
+        with col3:
+            st.metric("❌ Error Rate", f"{len(errors) / len(records):.1%}" if records else "–")
+        with col4:
+            st.metric("💾 Cache Hit Rate", f"{len(cache_hits) / len(cache_lookups):.0%}" if cache_lookups else "–")
+        
+        # Rolling histograms over the recent window
+        # Zero-padded labels keep the buckets in order on the chart axis
+        bucket_labels = [f"≤{bound:05.2f}s" for bound in LATENCY_BUCKETS] + ["≤∞"]
+        
+        def histogram(values):
+            counts = [0] * len(bucket_labels)
+            for value in values:
+                bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))
+                counts[bucket] += 1
+            return counts
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("### ⏱️ Latency")
+            st.bar_chart({"Requests": dict(zip(bucket_labels, histogram(latencies)))})
+        with col2:
+            st.markdown("### ⚡ Time to First Token")
+            ttfts = [record["ttft"] for record in records if record["ttft"] is not None and record["cache"] not in ("hit", "prefetch")]
+            st.bar_chart({"Requests": dict(zip(bucket_labels, histogram(ttfts)))})
+        
+        st.markdown("### 🔢 Tokens per Request")
+        st.line_chart({
+            "Prompt tokens": [record["prompt_tokens"] for record in records],
+            "Response tokens": [record["response_tokens"] for record in records],
+        })
+        
+        if errors:
+            st.markdown("### ❌ Errors")
+            error_counts = {}
+            for record in errors:
+                error_counts[record["error"]] = error_counts.get(record["error"], 0) + 1
+            st.bar_chart({"Errors": error_counts})
         
+        with st.expander("🧾 Recent Requests"):
+            st.dataframe(list(reversed(records[-200:])), use_container_width=True)
+    
+    st.markdown("### 🛡️ Resilience")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("🔌 Circuit", resilience.breaker.state.title())
+    with col2:
+        st.metric("🔁 Retries", resilience.retries)
+    with col3:
+        st.metric("🚦 Throttle Wait", f"{resilience.throttle_wait:.1f}s")
+    with col4:
+        st.metric("⛔ Fast Failures", resilience.rejections)
+    
+    st.markdown("### 🧠 Semantic Cache")
+    semantic_cache = assistant.semantic_cache
+    if semantic_cache is None:
+        st.info("Near-duplicate matching has not been turned on in this process yet.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("🎯 Near-duplicate Hits", semantic_cache.hits, f"{semantic_cache.hit_rate:.0%} of lookups")
+        with col2:
+            st.metric("⏱️ Latency Saved", f"{semantic_cache.saved_seconds:.1f}s")
         with col3:
-            bot_messages = len([msg for role, msg in st.session_state.chat_history if role == "assistant"])
-            st.metric("🤖 AI Responses", bot_messages)
+            st.metric("🗂️ Indexed Answers", f"{len(semantic_cache)}/{semantic_cache.max_entries}")
+        if semantic_cache.feature_hits:
+            st.caption(" · ".join(
+                f"{feature}: {hits} hits (threshold {semantic_cache.threshold(feature):.2f})"
+                for feature, hits in sorted(semantic_cache.feature_hits.items())
+            ))
+    
+    st.markdown("### 🔮 Prefetch")
+    if prefetcher.stats:
+        st.caption(f"Share of prefetched generations that a later click used: {prefetcher.hit_rate:.0%}")
+        st.dataframe([
+            {
+                "Follow-up": kind,
+                "Started": stats["issued"],
+                "Used": stats["hits"],
+                "Expired": stats["expired"],
+                "Dropped": stats["dropped"],
+                "Hit Rate": f"{stats['hits'] / stats['issued']:.0%}" if stats["issued"] else "-",
+            }
+            for kind, stats in sorted(prefetcher.stats.items())
+        ], use_container_width=True)
+    else:
+        st.info("No prefetches yet. Turn on \"🔮 Prefetch likely follow-ups\" in the sidebar.")
+    
+    st.markdown("### 🧭 Models")
+    if router.model_stats:
+        st.dataframe([
+            {
+                "Model": name,
+                "Calls": stats["calls"],
+                "Avg Latency (s)": round(stats["seconds"] / max(1, stats["calls"] - stats["errors"]), 3),
+                "Errors": stats["errors"],
+            }
+            for name, stats in sorted(router.model_stats.items())
+        ], use_container_width=True)
+    else:
+        st.info("No routed requests yet.")
+    if router.cascade_stats:
+        st.caption("Cascade escalation rate by feature (share of requests that needed more than the cheapest model)")
+        st.bar_chart({"Escalation Rate": {feature: router.escalation_rate(feature) for feature in router.cascade_stats}})
+    
+    st.markdown("### 🧩 Prompt Templates")
+    st.caption("Fixed tokens each template adds to every request; set `PROMPT_VARIANTS` to switch variants")
+    st.dataframe(prompts.REGISTRY.footprint(), use_container_width=True)
+    
+    st.markdown("### 📤 Export")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Download JSONL",
+            data="".join(json.dumps(record) + "\n" for record in telemetry.snapshot()),
+            file_name="telemetry.jsonl",
+            mime="application/jsonl"
+        )
+    with col2:
+        st.download_button(
+            label="📥 Download Prometheus Text",
+            data=telemetry.prometheus_text(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
+    if METRICS_PORT:
+        st.caption(f"Prometheus endpoint: `http://<host>:{METRICS_PORT}/metrics`")
+    with st.expander("📈 Prometheus Exposition"):
+        st.code(telemetry.prometheus_text(), language="text")
+
+# Cache statistics are filled in last so they include this run's lookups
+if response_cache is not None:
+    cache_summary = (
+        f"Hits: {response_cache.hits} · Misses: {response_cache.misses} · "
+        f"Hit rate: {response_cache.hit_rate:.0%} · Entries: {len(response_cache)}"
+    )
+    if assistant.semantic_cache is not None:
+        cache_summary += (
+            f"  \nNear-duplicate hits: {assistant.semantic_cache.hits} ({assistant.semantic_cache.hit_rate:.0%}) · "
+            f"Saved {assistant.semantic_cache.saved_seconds:.1f}s"
+        )
+    cache_stats.caption(cache_summary)
+
+st.sidebar.caption(
+    f"🧵 Engine: {engine.in_flight}/{engine.max_workers} in flight · "
+    f"{engine.submitted} sent · {engine.coalesced} coalesced"
+)
+if prefetch_followups:
+    st.sidebar.caption(
+        f"🔮 Prefetch: {prefetcher.hit_rate:.0%} used · "
+        f"{prefetcher.remaining(st.session_state.session_id)} left in this session's budget"
+    )
+st.sidebar.caption(
+    f"🛡️ API circuit: {resilience.breaker.state} · {resilience.retries} retries · "
+    f"{resilience.throttle_wait:.1f}s throttled"
+)
+
+# Startup report: one-time costs of this process plus the current rerun
+startup_report.finish_render(script_start)
+with st.sidebar.expander("⏱️ Startup Time"):
+    for phase, seconds in startup_report.phases.items():
+        st.caption(f"{phase}: {seconds * 1000:.0f} ms")
+    st.caption(f"This run: {(time.perf_counter() - script_start) * 1000:.0f} ms")
 
 # Footer
 st.markdown("---")
@@ -603,4 +1422,8 @@ st.markdown("""
     <p>🤖 AI Assistant Pro | Powered by Gemini-2.0 Flash</p>
     <p>Built with ❤️ using Streamlit</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+if refresh_after is not None:
+    time.sleep(refresh_after)
+    st.rerun()
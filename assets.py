@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(".cache", "assets"))
+ASSET_FETCH_TIMEOUT = float(os.getenv("ASSET_FETCH_TIMEOUT", "10"))
+ASSET_RETRY_AFTER = 60  # seconds to serve the fallback before retrying an unreachable URL
+FALLBACK_LOTTIE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "fallback_lottie.json")
+
+
+class LottieLoader:
+    """Lottie JSON loader backed by an in-process memo, a disk cache and a bundled fallback.
+
+    Network fetches run on a background thread, so a page only ever waits
+    `wait` seconds for the CDN before rendering the fallback; the fetched
+    animation is picked up from the memo on the next rerun.
+    """
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, fetch_timeout=ASSET_FETCH_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.fetch_timeout = fetch_timeout
+        self._memo = {}
+        self._pending = {}
+        self._failed_until = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="assets")
+        self._fallback = None
+
+    def _disk_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_disk(self, url):
+        try:
+            with open(self._disk_path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _fetch(self, url):
+        # Imported here so the HTTP stack loads on the background thread, not at app startup
+        import requests
+
+        try:
+            r = requests.get(url, timeout=self.fetch_timeout)
+            if r.status_code != 200:
+                return self._failed(url)
+            data = r.json()
+        except Exception:
+            return self._failed(url)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self._disk_path(url) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._disk_path(url))
+        except OSError:
+            pass
+
+        with self._lock:
+            self._memo[url] = data
+            self._pending.pop(url, None)
+        return data
+
+    def _failed(self, url):
+        with self._lock:
+            self._failed_until[url] = time.time() + ASSET_RETRY_AFTER
+            self._pending.pop(url, None)
+        return None
+
+    def prefetch(self, url):
+        """Start loading `url` in the background unless it is already available or on its way.
+
+        A copy in the disk cache is moved into the memo instead of fetching it again.
+        """
+        with self._lock:
+            if url in self._memo:
+                return None
+        data = self._read_disk(url)
+        if data is not None:
+            with self._lock:
+                self._memo.setdefault(url, data)
+            return None
+        return self._submit(url)
+
+    def _submit(self, url):
+        with self._lock:
+            if url in self._memo or self._failed_until.get(url, 0) > time.time():
+                return None
+            future = self._pending.get(url)
+            if future is None:
+                future = self._executor.submit(self._fetch, url)
+                self._pending[url] = future
+            return future
+
+    def fallback(self):
+        if self._fallback is None:
+            with open(FALLBACK_LOTTIE, encoding="utf-8") as f:
+                self._fallback = json.load(f)
+        return self._fallback
+
+    def load(self, url, wait=0.5):
+        """Return `(animation_json, source, seconds)`, where source is memory, disk, network or fallback."""
+        start = time.perf_counter()
+        with self._lock:
+            data = self._memo.get(url)
+        if data is not None:
+            return data, "memory", time.perf_counter() - start
+
+        data = self._read_disk(url)
+        if data is not None:
+            with self._lock:
+                self._memo[url] = data
+            return data, "disk", time.perf_counter() - start
+
+        future = self._submit(url)  # the disk cache was just checked
+        if future is not None:
+            try:
+                data = future.result(timeout=wait)
+            except FutureTimeoutError:
+                data = None
+            if data is not None:
+                return data, "network", time.perf_counter() - start
+
+        return self.fallback(), "fallback", time.perf_counter() - start
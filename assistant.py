@@ -0,0 +1,281 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import batch_translate
+import chunking
+import prompts
+from generation import DEFAULT_MODEL_NAME, GenerationResult
+from memory import ConversationMemory, estimate_tokens
+from router import CASCADE, CASCADE_MODELS, code_validator, length_validator, validate_non_empty
+from translation_memory import join_segments, split_segments
+
+# Features whose free-text input may be matched against near-duplicate earlier requests.
+# Code is left out: a flipped operator or a changed indent is a different program with a near-identical embedding.
+SEMANTIC_FEATURES = ("AI Chatbot",)
+
+
+@dataclass
+class FeatureRequest:
+    feature: str
+    prompt: str
+    validator: Callable[[str], bool] = validate_non_empty
+    query: Optional[str] = None  # the user's free text, for near-duplicate matching
+
+
+def content_request(topic, content_type=prompts.CONTENT_TYPES[0], length=prompts.CONTENT_LENGTHS[0],
+                    tone=prompts.TONES[0]):
+    return FeatureRequest(
+        "Content Writer", prompts.build_content_prompt(topic, content_type, length, tone), length_validator(length)
+    )
+
+
+def translation_request(text, source_lang, target_lang):
+    return FeatureRequest("Translator", prompts.build_translation_prompt(text, source_lang, target_lang))
+
+
+def code_request(description, language="Python", complexity="Intermediate", comments=True, examples=True,
+                 error_handling=True):
+    return FeatureRequest(
+        "Code Generator",
+        prompts.build_code_prompt(description, language, complexity, comments, examples, error_handling),
+        code_validator(language),
+    )
+
+
+def explain_request(code, level="Intermediate"):
+    return FeatureRequest("Code Explainer", prompts.build_explain_prompt(code, level), query=code)
+
+
+class Assistant:
+    """Content Writer, Translator, Code Assistant and Chatbot behind one interface.
+
+    The Streamlit UI and the HTTP API both call these methods, so prompts,
+    routing, caching and chunking behave the same everywhere. Every feature
+    method returns `(GenerationResult, model_name)` and accepts the options of
+    `run`; long translator and explainer inputs also report `on_progress(done, total)`.
+    """
+
+    def __init__(self, engine, router, cache=None, semantic_cache=None, translation_memory=None, prefetcher=None):
+        self.engine = engine
+        self.router = router
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.translation_memory = translation_memory
+        self.prefetcher = prefetcher
+
+    def cache_for(self, feature, query=None, use_cache=True, semantic=False):
+        if not use_cache:
+            return None
+        # Only `query` is fuzzy-matched; the rest of the prompt must be identical
+        if semantic and query and self.semantic_cache is not None and feature in SEMANTIC_FEATURES:
+            return self.semantic_cache.view(feature, query)
+        return self.cache
+
+    def model_for(self, model):
+        """`(name, model)` used for helper calls; the first cascade step when cascading."""
+        name = CASCADE_MODELS[0] if model == CASCADE else model
+        return name, self.router.get(name)
+
+    def run(self, request, model=DEFAULT_MODEL_NAME, stream=False, on_chunk=None, use_cache=True, semantic=False,
+            on_progress=None):
+        """Generate `request` with model `model`, or walk the cascade when it is `CASCADE`."""
+        if self.prefetcher is not None and use_cache:
+            name, target = self.model_for(model)
+            # Like a cache hit, a prefetched answer is only checked when the cascade would check it
+            text = self.prefetcher.take(target, request.prompt, request.validator if model == CASCADE else None)
+            if text:
+                if on_chunk:
+                    on_chunk(text)
+                if self.engine.telemetry is not None:
+                    self.engine.telemetry.record(
+                        feature=request.feature, model=name, prompt_tokens=estimate_tokens(request.prompt),
+                        response_tokens=estimate_tokens(text), elapsed=0.0, ttft=0.0, cache="prefetch"
+                    )
+                return GenerationResult(text=text, ttft=0.0, elapsed=0.0, prefetched=True), name
+        return self.router.generate(
+            self.engine, model, request.prompt, validator=request.validator, feature=request.feature,
+            stream=stream, on_chunk=on_chunk, cache=self.cache_for(request.feature, request.query, use_cache, semantic)
+        )
+
+    def _map(self, feature, chunk_prompts, model=DEFAULT_MODEL_NAME, use_cache=True, on_progress=None, **_):
+        name, target = self.model_for(model)
+        start = time.perf_counter()
+        parts = chunking.map_chunks(
+            self.engine, target, chunk_prompts, cache=self.cache_for(feature, use_cache=use_cache),
+            feature=feature, on_progress=on_progress
+        )
+        return parts, time.perf_counter() - start, name
+
+    def write_content(self, topic, content_type=prompts.CONTENT_TYPES[0], length=prompts.CONTENT_LENGTHS[0],
+                      tone=prompts.TONES[0], **options):
+        return self.run(content_request(topic, content_type, length, tone), **options)
+
+    def translate(self, text, source_lang, target_lang, on_segments=None, **options):
+        """Translate `text`, re-sending only paragraphs missing from the translation memory.
+
+        `on_segments(reused, total)` reports how many paragraphs came from the memory.
+        """
+        memory = self.translation_memory
+        if memory is None or not options.get("use_cache", True):
+            return self._translate_text(text, source_lang, target_lang, **options)
+
+        start = time.perf_counter()
+        segments, separators = split_segments(text)
+        known = memory.get_many(source_lang, target_lang, segments)
+        missing = [index for index, segment in enumerate(segments) if segment.strip() and index not in known]
+        if on_segments:
+            on_segments(len(known), len(known) + len(missing))
+        if not known:
+            # Nothing to reuse, so keep the normal routed and streamed path and remember its paragraphs
+            result, name = self._translate_text(text, source_lang, target_lang, **options)
+            sources = [segment for segment in segments if segment.strip()]
+            translations = [segment.strip() for segment in split_segments(result.text.strip())[0] if segment.strip()]
+            if len(translations) == len(sources):
+                memory.put_many(source_lang, target_lang, zip(sources, translations))
+            return result, name
+
+        model = options.get("model", DEFAULT_MODEL_NAME)
+        name = CASCADE_MODELS[0] if model == CASCADE else model
+        if missing:
+            translations, name = self._translate_segments(
+                [segments[index] for index in missing], source_lang, target_lang, **options
+            )
+            memory.put_many(source_lang, target_lang, [(segments[index], translation)
+                                                       for index, translation in zip(missing, translations)])
+            known.update(zip(missing, translations))
+        translated = join_segments([known.get(index, segment) for index, segment in enumerate(segments)], separators)
+        elapsed = time.perf_counter() - start
+        return GenerationResult(text=translated, ttft=None, elapsed=elapsed, cached=not missing), name
+
+    def _translate_segments(self, texts, source_lang, target_lang, on_progress=None, **options):
+        """Translate `texts` in JSON-array batches routed like any request. Returns `(translations, model_name)`."""
+        options.update(stream=False, on_chunk=None)
+        batches = batch_translate.pack_batches(texts)
+        translations = [None] * len(texts)
+        name = options.get("model", DEFAULT_MODEL_NAME)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(batches), batch_translate.BATCH_CONCURRENCY)),
+                                thread_name_prefix="translate") as pool:
+            futures = {
+                pool.submit(
+                    self._translate_batch, [texts[i] for i in batch], source_lang, target_lang, **options
+                ): batch
+                for batch in batches
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                batch_translations, name = future.result()
+                for index, translation in zip(futures[future], batch_translations):
+                    translations[index] = translation
+                if on_progress:
+                    on_progress(done, len(batches))
+        return translations, name
+
+    def _translate_batch(self, texts, source_lang, target_lang, **options):
+        # The cascade escalates misaligned replies; a reply that is still misaligned is split in half and retried
+        request = FeatureRequest(
+            "Translator", batch_translate.build_batch_prompt(texts, source_lang, target_lang),
+            lambda text: batch_translate.parse_batch_response(text, len(texts)) is not None
+        )
+        result, name = self.run(request, **options)
+        translations = batch_translate.parse_batch_response(result.text, len(texts))
+        if translations is not None:
+            return translations, name
+        if len(texts) == 1:
+            return [result.text.strip()], name
+        middle = len(texts) // 2
+        first, _ = self._translate_batch(texts[:middle], source_lang, target_lang, **options)
+        second, name = self._translate_batch(texts[middle:], source_lang, target_lang, **options)
+        return first + second, name
+
+    def _translate_text(self, text, source_lang, target_lang, **options):
+        chunks = chunking.split_text(text)
+        if len(chunks) == 1:
+            return self.run(translation_request(text, source_lang, target_lang), **options)
+        # Long text: translate paragraphs in parallel and stitch them back in order
+        parts, elapsed, name = self._map("Translator", [
+            prompts.build_translation_chunk_prompt(chunk, i, len(chunks), source_lang, target_lang)
+            for i, chunk in enumerate(chunks, start=1)
+        ], **options)
+        return GenerationResult(text="\n\n".join(parts), ttft=None, elapsed=elapsed), name
+
+    def generate_code(self, description, language="Python", complexity="Intermediate", comments=True,
+                      examples=True, error_handling=True, **options):
+        return self.run(code_request(description, language, complexity, comments, examples, error_handling), **options)
+
+    def generate_code_many(self, description, languages, complexity="Intermediate", comments=True, examples=True,
+                           error_handling=True, **options):
+        """Generate `description` in every language of `languages` at once.
+
+        Yields `(language, result, model_name, error)` in completion order,
+        with `error` set instead of a result when that language failed. The
+        engine still caps how many model calls run at a time.
+        """
+        options.update(stream=False, on_chunk=None)
+        with ThreadPoolExecutor(max_workers=max(1, len(languages)), thread_name_prefix="code") as pool:
+            futures = {
+                pool.submit(self.generate_code, description, language, complexity, comments, examples,
+                            error_handling, **options): language
+                for language in languages
+            }
+            for future in as_completed(futures):
+                try:
+                    result, name = future.result()
+                except Exception as e:
+                    yield futures[future], None, None, e
+                else:
+                    yield futures[future], result, name, None
+
+    def explain_code(self, code, level="Intermediate", **options):
+        request = explain_request(code, level)
+        chunks = chunking.split_code(code)
+        if len(chunks) > 1:
+            # Large file: explain each part in parallel, then synthesize one explanation
+            section_notes, _, _ = self._map("Code Explainer", [
+                prompts.build_explain_chunk_prompt(chunk, i, len(chunks), level)
+                for i, chunk in enumerate(chunks, start=1)
+            ], **options)
+            request.prompt = prompts.build_explain_synthesis_prompt(section_notes, level)
+        return self.run(request, **options)
+
+    def _prefetch(self, session_id, kind, request, model=DEFAULT_MODEL_NAME, use_cache=True, **_):
+        if self.prefetcher is None:
+            return False
+        _, target = self.model_for(model)
+        return self.prefetcher.schedule(
+            session_id, kind, target, request.prompt, feature=request.feature,
+            cache=self.cache_for(request.feature, use_cache=use_cache)
+        )
+
+    def prefetch_explanation(self, session_id, code, level="Intermediate", **options):
+        """Start explaining freshly generated `code` before the user asks for it."""
+        if len(chunking.split_code(code)) > 1:
+            return False  # large files go through the chunked explainer, not one prompt
+        return self._prefetch(session_id, "Code Explainer", explain_request(code, level), **options)
+
+    def prefetch_content_variants(self, session_id, topic, content_type=prompts.CONTENT_TYPES[0],
+                                  length=prompts.CONTENT_LENGTHS[0], tone=prompts.TONES[0], **options):
+        """Start the same piece in the other lengths, the usual next regeneration."""
+        return [
+            self._prefetch(session_id, "Content Writer", content_request(topic, content_type, other, tone), **options)
+            for other in prompts.CONTENT_LENGTHS if other != length
+        ]
+
+    def chat(self, history, memory=None, mode=None, **options):
+        """Answer the last user message in `history`, a sequence of `(role, content)` pairs.
+
+        `memory` keeps the rolling summary between calls; without one the
+        older turns are summarized afresh for this request. The turn's prompt
+        size is recorded on `memory.turn_stats[-1]` under `mode`.
+        """
+        memory = memory if memory is not None else ConversationMemory()
+        _, summary_model = self.model_for(options.get("model", DEFAULT_MODEL_NAME))
+        summary, recent_turns = memory.build_context(
+            history,
+            summarize=lambda summary_prompt: self.engine.generate(
+                summary_model, summary_prompt, feature="Chat Summary"
+            ).text
+        )
+        request = FeatureRequest("AI Chatbot", prompts.build_chat_prompt(summary, recent_turns), query=history[-1][1])
+        memory.record(estimate_tokens(request.prompt), estimate_tokens(summary), len(recent_turns), mode=mode)
+        return self.run(request, **options)
@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from generation import generate_text
+
+BATCH_MAX_CHARS = int(os.getenv("BATCH_MAX_CHARS", "4000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def read_segments(filename, data):
+    """Parse an uploaded CSV, JSONL or TXT file into a list of text segments."""
+    text = data.decode("utf-8-sig")
+    extension = os.path.splitext(filename)[1].lower()
+
+    if extension == ".csv":
+        rows = list(csv.reader(io.StringIO(text)))
+        if not rows:
+            return []
+        header = [cell.strip().lower() for cell in rows[0]]
+        if "text" in header:
+            column = header.index("text")
+            rows = rows[1:]
+        else:
+            column = 0
+        return [row[column] for row in rows if len(row) > column and row[column].strip()]
+
+    if extension == ".jsonl":
+        segments = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            segments.append(item["text"] if isinstance(item, dict) else str(item))
+        return segments
+
+    return [line for line in text.splitlines() if line.strip()]
+
+
+def pack_batches(segments, max_chars=BATCH_MAX_CHARS):
+    """Group segment indexes into batches whose combined text stays under `max_chars`."""
+    batches = []
+    current = []
+    size = 0
+    for index, segment in enumerate(segments):
+        if current and size + len(segment) > max_chars:
+            batches.append(current)
+            current = []
+            size = 0
+        current.append(index)
+        size += len(segment)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(texts, source_lang, target_lang):
+    return (
+        f"Translate each string in the following JSON array from {source_lang} to {target_lang}.\n"
+        "Provide accurate and natural translations. Keep placeholders, markup and line breaks intact.\n"
+        "Reply with only a JSON array of the translated strings, in the same order and of the same length.\n\n"
+        f"{json.dumps(texts, ensure_ascii=False)}"
+    )
+
+
+def parse_batch_response(text, expected):
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    try:
+        translations = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(translations, list) or len(translations) != expected:
+        return None
+    return [str(item) for item in translations]
+
+
+def translate_batch(model, texts, source_lang, target_lang, cache=None, engine=None, feature="Batch Translator"):
+    """Translate a list of texts with one prompt, splitting the batch when the reply is misaligned."""
+    prompt = build_batch_prompt(texts, source_lang, target_lang)
+    if engine:
+        result = engine.generate(model, prompt, cache=cache, feature=feature)
+    else:
+        result = generate_text(model, prompt, cache=cache)
+    translations = parse_batch_response(result.text, len(texts))
+    if translations is not None:
+        return translations
+    if len(texts) == 1:
+        return [result.text.strip()]
+    middle = len(texts) // 2
+    return (translate_batch(model, texts[:middle], source_lang, target_lang, cache, engine, feature)
+            + translate_batch(model, texts[middle:], source_lang, target_lang, cache, engine, feature))
+
+
+def translate_segments(model, segments, source_lang, target_langs, max_chars=BATCH_MAX_CHARS,
+                       concurrency=BATCH_CONCURRENCY, cache=None, engine=None, on_progress=None,
+                       feature="Batch Translator"):
+    """Translate every segment into every target language.
+
+    Returns a dict mapping each target language to a list aligned with `segments`.
+    `on_progress(done, total)` is called from the calling thread as batches finish.
+    With an `engine`, model calls also count against its global concurrency cap.
+    """
+    results = {lang: [None] * len(segments) for lang in target_langs}
+    jobs = [(lang, batch) for lang in target_langs for batch in pack_batches(segments, max_chars)]
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(
+                translate_batch, model, [segments[i] for i in batch], source_lang, lang, cache, engine, feature
+            ): (lang, batch)
+            for lang, batch in jobs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            lang, batch = futures[future]
+            for index, translation in zip(batch, future.result()):
+                results[lang][index] = translation
+            if on_progress:
+                on_progress(done, len(jobs))
+
+    return results
+
+
+def to_csv(segments, results):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["source"] + list(results))
+    for index, segment in enumerate(segments):
+        writer.writerow([segment] + [results[lang][index] for lang in results])
+    return buffer.getvalue()
+
+
+def to_jsonl(segments, results, language_codes):
+    lines = []
+    for index, segment in enumerate(segments):
+        row = {"source": segment}
+        row.update({language_codes.get(lang, lang): results[lang][index] for lang in results})
+        lines.append(json.dumps(row, ensure_ascii=False))
+    return "\n".join(lines) + "\n"
+
+
+def to_zip(results, language_codes):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for lang, translations in results.items():
+            # One line per segment, so embedded line breaks would shift the alignment
+            lines = (translation.replace("\n", " ") for translation in translations)
+            archive.writestr(f"{language_codes.get(lang, lang)}.txt", "\n".join(lines) + "\n")
+    return buffer.getvalue()
@@ -0,0 +1,205 @@
+"""Benchmark the assistant's generation paths against a mock or live Gemini backend.
+
+Examples:
+    python bench.py                                   # all features, mock backend
+    python bench.py --feature translate --requests 200 --concurrency 16 --stream
+    python bench.py --error-rate 0.05 --latency 0.5 --json bench.json
+    python bench.py --backend gemini --requests 10    # live API, needs GOOGLE_API_KEY
+    python bench.py --backend gemini --prompt-variant lean   # A/B a prompt variant against the baseline
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import prompts
+from engine import GenerationEngine
+from generation import DEFAULT_MODEL_NAME
+from memory import estimate_tokens
+from mock_model import MockModel
+from resilience import ResiliencePolicy
+from router import code_validator, length_validator, validate_non_empty
+
+TOPICS = ["Benefits of renewable energy", "Remote work productivity", "History of the bicycle",
+          "Intro to machine learning", "Healthy meal prep"]
+LANGUAGES = ["English", "Spanish", "French", "German", "Italian", "Portuguese", "Chinese", "Japanese",
+             "Korean", "Arabic"]
+PROGRAMMING_LANGUAGES = ["Python", "JavaScript", "Java", "C++", "C#", "Go", "Rust", "PHP", "Ruby", "Swift"]
+SAMPLE_CODE = """def fibonacci(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+"""
+
+
+def _pick(options, i):
+    return options[i % len(options)]
+
+
+# Each builder turns a request number into a prompt, varying the inputs like real traffic would
+WORKLOADS = {
+    "content": lambda i: prompts.build_content_prompt(
+        f"{_pick(TOPICS, i)} #{i}", _pick(prompts.CONTENT_TYPES, i), _pick(prompts.CONTENT_LENGTHS, i),
+        _pick(prompts.TONES, i)),
+    "translate": lambda i: prompts.build_translation_prompt(
+        f"Welcome back! You have {i} new messages.", "English", _pick(LANGUAGES[1:], i)),
+    "code": lambda i: prompts.build_code_prompt(
+        f"Create a function that returns the {i}th prime number", _pick(PROGRAMMING_LANGUAGES, i),
+        "Intermediate", True, i % 2 == 0, i % 3 == 0),
+    "explain": lambda i: prompts.build_explain_prompt(
+        SAMPLE_CODE.replace("n)", f"n={i})"), _pick(["Beginner-friendly", "Technical", "Line-by-line"], i)),
+    "chat": lambda i: prompts.build_chat_prompt("", [
+        ("user", "Hi, can you help me plan a trip?"),
+        ("assistant", "Of course! Where would you like to go?"),
+        ("user", f"Somewhere warm for {i + 1} days."),
+    ]),
+}
+
+
+# Cheap output checks per request number, used as a quality signal when comparing prompt variants
+VALIDATORS = {
+    "content": lambda i: length_validator(_pick(prompts.CONTENT_LENGTHS, i)),
+    "code": lambda i: code_validator(_pick(PROGRAMMING_LANGUAGES, i)),
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def create_backend(args):
+    if args.backend == "mock":
+        return MockModel(
+            latency=args.latency, jitter=args.jitter, chunk_interval=args.chunk_interval,
+            chunk_words=args.chunk_words, response_words=args.response_words,
+            error_rate=args.error_rate, seed=args.seed,
+        )
+
+    import google.generativeai as genai
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    return genai.GenerativeModel(args.model)
+
+
+def run_workload(model, feature, args):
+    resilience = None
+    if args.resilience:
+        resilience = ResiliencePolicy(rpm=args.rpm, burst=args.concurrency, backoff_base=args.backoff_base)
+    engine = GenerationEngine(max_workers=args.concurrency, resilience=resilience)
+    distinct = args.distinct or args.requests
+    latencies, ttfts, tokens, prompt_tokens, errors = [], [], [], [], {}
+    valid = 0
+
+    def one(i):
+        prompt = WORKLOADS[feature](i % distinct)
+        start = time.perf_counter()
+        try:
+            result = engine.generate(model, prompt, stream=args.stream)
+        except Exception as e:
+            return None, type(e).__name__
+        is_valid = VALIDATORS.get(feature, lambda _: validate_non_empty)(i % distinct)(result.text)
+        return (time.perf_counter() - start, result, estimate_tokens(prompt), is_valid), None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as clients:
+        for outcome, error in clients.map(one, range(args.requests)):
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+                continue
+            latency, result, prompt_size, is_valid = outcome
+            latencies.append(latency)
+            prompt_tokens.append(prompt_size)
+            valid += is_valid
+            if result.ttft is not None:
+                ttfts.append(result.ttft)
+            tokens.append(estimate_tokens(result.text))
+    wall = time.perf_counter() - start
+    engine.shutdown()
+
+    return {
+        "feature": feature,
+        "requests": args.requests,
+        "ok": len(latencies),
+        "errors": errors,
+        "coalesced": engine.coalesced,
+        "retries": resilience.retries if resilience else 0,
+        "throttle_wait_seconds": resilience.throttle_wait if resilience else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "ttft_p50": percentile(ttfts, 50),
+        "requests_per_sec": len(latencies) / wall if wall else 0.0,
+        "tokens_per_sec": sum(tokens) / wall if wall else 0.0,
+        "prompt_tokens_avg": sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else 0.0,
+        "valid_rate": valid / len(latencies) if latencies else 0.0,
+        "wall_seconds": wall,
+    }
+
+
+def print_report(rows):
+    header = (
+        f"{'feature':<10} {'ok':>6} {'err':>5} {'retry':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'ttft50':>8} "
+        f"{'req/s':>8} {'tok/s':>9} {'ptok':>6} {'valid':>6}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['feature']:<10} {row['ok']:>6} {sum(row['errors'].values()):>5} {row['retries']:>6} "
+            f"{row['p50']:>8.3f} {row['p95']:>8.3f} {row['p99']:>8.3f} {row['ttft_p50']:>8.3f} "
+            f"{row['requests_per_sec']:>8.1f} {row['tokens_per_sec']:>9.0f} {row['prompt_tokens_avg']:>6.0f} "
+            f"{row['valid_rate']:>6.0%}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark AI Assistant Pro generation paths.")
+    parser.add_argument("--backend", choices=["mock", "gemini"], default="mock")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help="Gemini model for --backend gemini")
+    parser.add_argument("--feature", choices=["all"] + list(WORKLOADS), default="all")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="Number of distinct prompts to cycle through (default: all distinct)")
+    parser.add_argument("--stream", action="store_true", help="Use streaming generation")
+    parser.add_argument("--resilience", action="store_true", help="Enable rate limiting, retries and circuit breaker")
+    parser.add_argument("--rpm", type=float, default=0, help="Rate limit in requests/minute with --resilience (0: off)")
+    parser.add_argument("--backoff-base", type=float, default=0.05, help="Base retry backoff in seconds")
+    parser.add_argument("--prompt-variant", default="baseline",
+                        help="Prompt template variant to use wherever one exists, e.g. 'lean'")
+    mock = parser.add_argument_group("mock backend")
+    mock.add_argument("--latency", type=float, default=0.2, help="Seconds until the first chunk")
+    mock.add_argument("--jitter", type=float, default=0.05)
+    mock.add_argument("--chunk-interval", type=float, default=0.02, help="Seconds between streamed chunks")
+    mock.add_argument("--chunk-words", type=int, default=8)
+    mock.add_argument("--response-words", type=int, default=120)
+    mock.add_argument("--error-rate", type=float, default=0.0)
+    mock.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for name, variants in prompts.REGISTRY.templates.items():
+        if args.prompt_variant in variants:
+            prompts.REGISTRY.activate(name, args.prompt_variant)
+    model = create_backend(args)
+    features = list(WORKLOADS) if args.feature == "all" else [args.feature]
+    rows = [run_workload(model, feature, args) for feature in features]
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
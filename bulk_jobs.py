@@ -0,0 +1,188 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import prompts
+
+JOBS_DIR = os.getenv("BULK_JOBS_DIR", os.path.join(".cache", "jobs"))
+BULK_PARALLELISM = int(os.getenv("BULK_PARALLELISM", "4"))
+# How often the Content Writer page refreshes a running job's progress and downloads
+BULK_REFRESH_SECONDS = float(os.getenv("BULK_REFRESH_SECONDS", "2"))
+
+
+def _match_option(value, options, default):
+    # Accept short forms such as "short" or "blog" for the full option labels
+    value = (value or "").strip().lower()
+    if not value:
+        return default
+    for option in options:
+        if option.lower() == value or option.lower().startswith(value):
+            return option
+    raise ValueError(f"Unknown value '{value}', expected one of: {', '.join(options)}")
+
+
+def read_rows(data, default_type=prompts.CONTENT_TYPES[0], default_length=prompts.CONTENT_LENGTHS[0],
+              default_tone=prompts.TONES[0]):
+    """Parse a CSV with `topic`, `content type`, `length` and `tone` columns into job rows."""
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    columns = {re.sub(r"[\s_]+", " ", name.strip().lower()): name for name in reader.fieldnames or []}
+    if "topic" not in columns:
+        raise ValueError("The CSV needs a 'topic' column")
+
+    rows = []
+    for line, record in enumerate(reader, start=2):
+        def field(name):
+            return record.get(columns[name], "") if name in columns else ""
+
+        topic = field("topic").strip()
+        if not topic:
+            continue
+        try:
+            rows.append({
+                "topic": topic,
+                "content_type": _match_option(field("content type"), prompts.CONTENT_TYPES, default_type),
+                "length": _match_option(field("length"), prompts.CONTENT_LENGTHS, default_length),
+                "tone": _match_option(field("tone"), prompts.TONES, default_tone),
+            })
+        except ValueError as e:
+            raise ValueError(f"Row {line}: {e}")
+    return rows
+
+
+def job_id_for(rows):
+    # The same spreadsheet always maps to the same job, which is what makes re-uploads resume
+    return hashlib.sha256(json.dumps(rows, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class BulkJob:
+    """One spreadsheet of content rows, checkpointed to `<jobs dir>/<id>/results.jsonl` as rows finish."""
+
+    def __init__(self, rows, jobs_dir=JOBS_DIR):
+        self.rows = rows
+        self.id = job_id_for(rows)
+        self.dir = os.path.join(jobs_dir, self.id)
+        self.results_path = os.path.join(self.dir, "results.jsonl")
+        self.state = "pending"
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._results = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.dir, exist_ok=True)
+        with open(os.path.join(self.dir, "rows.json"), "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.results_path):
+            return
+        with open(self.results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue  # a torn final line from an interrupted write
+                self._results[item["index"]] = item
+
+    def _checkpoint(self, item):
+        with self._lock:
+            self._results[item["index"]] = item
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    def completed(self):
+        with self._lock:
+            return sorted((item for item in self._results.values() if not item.get("error")),
+                          key=lambda item: item["index"])
+
+    def failed(self):
+        with self._lock:
+            return sorted((item for item in self._results.values() if item.get("error")),
+                          key=lambda item: item["index"])
+
+    def pending_indexes(self):
+        with self._lock:
+            done = {index for index, item in self._results.items() if not item.get("error")}
+        return [index for index in range(len(self.rows)) if index not in done]
+
+    @property
+    def running(self):
+        return self.state == "running"
+
+    def run(self, engine, model, parallelism=BULK_PARALLELISM, cache=None):
+        """Generate every row that has no successful checkpoint yet. Blocks until done."""
+        self.state = "running"
+        self.started_at = time.time()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+                futures = {
+                    executor.submit(self._generate_row, engine, model, index, cache): index
+                    for index in self.pending_indexes()
+                }
+                for future in as_completed(futures):
+                    self._checkpoint(future.result())
+            self.state = "completed" if not self.failed() else "completed with errors"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+
+    def _generate_row(self, engine, model, index, cache):
+        row = self.rows[index]
+        prompt = prompts.build_content_prompt(row["topic"], row["content_type"], row["length"], row["tone"])
+        item = dict(row, index=index)
+        try:
+            item["text"] = engine.generate(model, prompt, cache=cache, feature="Bulk Content").text
+            if not item["text"]:
+                item["error"] = "No content generated"
+        except Exception as e:
+            item["error"] = f"{type(e).__name__}: {e}"
+        return item
+
+    def to_jsonl(self):
+        return "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in self.completed())
+
+    def to_zip(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for item in self.completed():
+                slug = re.sub(r"[^A-Za-z0-9]+", "_", item["topic"]).strip("_")[:60] or "content"
+                archive.writestr(f"{item['index'] + 1:04d}_{slug}.txt", item["text"])
+            archive.writestr("results.jsonl", self.to_jsonl())
+        return buffer.getvalue()
+
+
+class JobManager:
+    """Process-wide registry of bulk jobs, each running on its own background thread."""
+
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, rows, engine, model, parallelism=BULK_PARALLELISM, cache=None):
+        """Start (or resume from its checkpoint) the job for `rows` and return it."""
+        with self._lock:
+            job = self.jobs.get(job_id_for(rows))
+            if job is not None and job.running:
+                return job
+            job = BulkJob(rows, self.jobs_dir)
+            job.state = "running"
+            self.jobs[job.id] = job
+        threading.Thread(
+            target=job.run, args=(engine, model, parallelism, cache), name=f"bulk-job-{job.id}", daemon=True
+        ).start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
@@ -0,0 +1,62 @@
+import itertools
+
+from memory import estimate_tokens
+
+CHAT_SYSTEM_INSTRUCTION = (
+    "You are a helpful AI assistant. Respond to the user's message in a friendly and informative way."
+)
+
+FLATTENED_MODE = "Flattened prompt"
+NATIVE_MODE = "Native chat session"
+CHAT_MODES = [FLATTENED_MODE, NATIVE_MODE]
+
+_session_ids = itertools.count(1)
+
+
+def create_chat_model(model_name):
+    """Build a chat model with the system instruction set once.
+
+    Returns `(model, has_system_instruction)`. SDK releases without
+    `system_instruction` support get the instruction as the first history turn instead.
+    """
+    import google.generativeai as genai
+
+    try:
+        return genai.GenerativeModel(model_name, system_instruction=CHAT_SYSTEM_INSTRUCTION), True
+    except TypeError:
+        return genai.GenerativeModel(model_name), False
+
+
+def _to_content(role, text):
+    return {"role": "user" if role == "user" else "model", "parts": [text]}
+
+
+class NativeChatSession:
+    """Per-session multi-turn chat that keeps structured role history on the client.
+
+    Exposes `generate_content` so the generation engine can drive it like a
+    model; each call sends one user message with `ChatSession.send_message`.
+    """
+
+    def __init__(self, model, has_system_instruction, history=()):
+        # Unique per session so the engine never coalesces two users' turns
+        self.model_name = f"chat-session-{next(_session_ids)}"
+        self.base_model_name = getattr(model, "model_name", None)
+        self.has_system_instruction = has_system_instruction
+        seed = []
+        if not has_system_instruction:
+            seed = [_to_content("user", CHAT_SYSTEM_INSTRUCTION), _to_content("assistant", "Understood.")]
+        self.chat = model.start_chat(history=seed + [_to_content(role, content) for role, content in history])
+
+    def generate_content(self, message, stream=False):
+        return self.chat.send_message(message, stream=stream)
+
+    def prompt_tokens(self, message):
+        # The API is stateless, so every turn carries the structured history plus the new message
+        history_tokens = sum(
+            estimate_tokens(getattr(part, "text", "") or "")
+            for content in self.chat.history
+            for part in content.parts
+        )
+        system_tokens = estimate_tokens(CHAT_SYSTEM_INSTRUCTION) if self.has_system_instruction else 0
+        return system_tokens + history_tokens + estimate_tokens(message)
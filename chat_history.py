@@ -0,0 +1,131 @@
+import json
+import os
+import time
+import uuid
+from collections import deque
+
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "200"))
+CHAT_SPILL_DIR = os.getenv("CHAT_SPILL_DIR", os.path.join(".cache", "chats"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+# Spill logs untouched for this long belong to sessions that are gone
+CHAT_SPILL_MAX_AGE_DAYS = float(os.getenv("CHAT_SPILL_MAX_AGE_DAYS", "7"))
+
+
+def purge_spill_logs(spill_dir=CHAT_SPILL_DIR, max_age_days=CHAT_SPILL_MAX_AGE_DAYS):
+    """Delete spill logs last written more than `max_age_days` ago. Returns how many were removed."""
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    try:
+        entries = list(os.scandir(spill_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.name.endswith(".jsonl"):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass  # already removed by another process
+    return removed
+
+
+class ChatHistory:
+    """Per-session list of `(role, content)` messages with running counters.
+
+    Only the newest `max_messages` are kept in memory; older ones are appended
+    to `<spill dir>/<session id>.jsonl` and read back by seeking to their line
+    when a slice or page reaches them. Indexes are absolute, so it can stand in
+    for the plain list anywhere `len`, indexing and slicing are used.
+    """
+
+    def __init__(self, max_messages=CHAT_HISTORY_MAX_MESSAGES, spill_dir=CHAT_SPILL_DIR, session_id=None):
+        self.max_messages = max(1, max_messages)
+        self.session_id = session_id or uuid.uuid4().hex
+        self.spill_path = os.path.join(spill_dir, f"{self.session_id}.jsonl")
+        self.counts = {"user": 0, "assistant": 0}
+        self._recent = deque()
+        self._offsets = []  # byte offset of each spilled message in the log
+
+    @classmethod
+    def from_messages(cls, messages, session_id=None, **kwargs):
+        """Rebuild a history, e.g. a reopened conversation, dropping any stale spill log for `session_id`."""
+        history = cls(session_id=session_id, **kwargs)
+        if os.path.exists(history.spill_path):
+            os.remove(history.spill_path)
+        for role, content in messages:
+            history.append(role, content)
+        return history
+
+    @property
+    def spilled(self):
+        return len(self._offsets)
+
+    def __len__(self):
+        return self.spilled + len(self._recent)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def append(self, role, content):
+        self._recent.append((role, content))
+        self.counts[role] = self.counts.get(role, 0) + 1
+        while len(self._recent) > self.max_messages:
+            self._spill(self._recent.popleft())
+
+    def _spill(self, item):
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.spill_path, "ab") as f:
+            self._offsets.append(f.tell())
+            f.write((json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def _read_spilled(self, start, stop):
+        if start >= stop:
+            return []
+        items = []
+        with open(self.spill_path, "rb") as f:
+            f.seek(self._offsets[start])
+            for _ in range(stop - start):
+                role, content = json.loads(f.readline())
+                items.append((role, content))
+        return items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return self[:][index]
+            stop = max(start, stop)
+            items = self._read_spilled(start, min(stop, self.spilled))
+            recent_start, recent_stop = max(0, start - self.spilled), max(0, stop - self.spilled)
+            items.extend(self._recent[i] for i in range(recent_start, recent_stop))
+            return items
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chat history index out of range")
+        if index < self.spilled:
+            return self._read_spilled(index, index + 1)[0]
+        return self._recent[index - self.spilled]
+
+    def page_count(self, page_size=CHAT_PAGE_SIZE):
+        return max(1, -(-len(self) // page_size))
+
+    def page(self, number, page_size=CHAT_PAGE_SIZE):
+        """Messages on page `number` counted back from the newest (page 0), as `(index, role, content)`."""
+        stop = max(0, len(self) - number * page_size)
+        start = max(0, stop - page_size)
+        return [(start + offset, role, content) for offset, (role, content) in enumerate(self[start:stop])]
+
+    def clear(self):
+        self._recent.clear()
+        self._offsets = []
+        self.counts = {"user": 0, "assistant": 0}
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
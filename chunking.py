@@ -0,0 +1,78 @@
+import os
+import re
+from concurrent.futures import as_completed
+
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "6000"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+# Top-level declarations in the languages offered by the Code Assistant
+_CODE_BOUNDARY = re.compile(
+    r"^(?:@|def |async def |class |function |export |func |fn |pub |impl |struct |interface |enum |module |"
+    r"public |private |protected |static |template|namespace |package |import |from |#include|using )"
+)
+
+
+def _pack(pieces, max_chars, separator):
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(separator) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _hard_split(text, max_chars):
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def split_text(text, max_chars=CHUNK_MAX_CHARS):
+    """Split prose on paragraph boundaries, then sentences, keeping chunks under `max_chars`."""
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _pack(_SENTENCE_END.split(paragraph), max_chars, " "):
+            pieces.extend(_hard_split(sentence, max_chars) if len(sentence) > max_chars else [sentence])
+    return _pack(pieces, max_chars, "\n\n")
+
+
+def split_code(code, max_chars=CHUNK_MAX_CHARS):
+    """Split source code at top-level function/class boundaries, keeping chunks under `max_chars`."""
+    blocks = []
+    current = []
+    for line in code.strip("\n").splitlines():
+        if current and _CODE_BOUNDARY.match(line) and not _CODE_BOUNDARY.match(current[-1]):
+            blocks.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+
+    pieces = []
+    for block in blocks:
+        if len(block) <= max_chars:
+            pieces.append(block)
+        else:
+            # An oversized function is split on line boundaries as a last resort
+            pieces.extend(_pack(block.splitlines(), max_chars, "\n"))
+    return _pack(pieces, max_chars, "\n")
+
+
+def map_chunks(engine, model, prompts, cache=None, on_progress=None, feature=None):
+    """Run every prompt on the engine in parallel and return the texts in input order."""
+    futures = {
+        engine.submit(model, prompt, cache=cache, feature=feature): index
+        for index, prompt in enumerate(prompts)
+    }
+    results = [None] * len(prompts)
+    for done, future in enumerate(as_completed(futures), start=1):
+        results[futures[future]] = future.result().text.strip()
+        if on_progress:
+            on_progress(done, len(prompts))
+    return results
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from generation import generate_text, model_name_of
+from memory import estimate_tokens
+from resilience import GuardedModel
+from response_cache import cache_key
+
+ENGINE_MAX_WORKERS = int(os.getenv("ENGINE_MAX_WORKERS", "8"))
+
+
+class _Flight:
+    """One in-flight generation that any number of identical requests can wait on."""
+
+    def __init__(self):
+        self.future = Future()
+        self.text = ""
+        self.version = 0
+        self.changed = threading.Condition()
+        self.future.add_done_callback(lambda _: self._notify())
+
+    def publish(self, text):
+        with self.changed:
+            self.text = text
+            self.version += 1
+            self.changed.notify_all()
+
+    def _notify(self):
+        with self.changed:
+            self.changed.notify_all()
+
+
+class GenerationEngine:
+    """Process-wide generation executor with a concurrency cap and single-flight coalescing.
+
+    Model calls run on a bounded thread pool so no more than `max_workers`
+    requests reach the API at once, whichever session they come from. Identical
+    prompts for the same model that are already in flight share one call.
+    Every call is reported to `telemetry` and guarded by the `resilience`
+    policy (rate limit, retries, circuit breaker) when they are given.
+    """
+
+    def __init__(self, max_workers=ENGINE_MAX_WORKERS, telemetry=None, resilience=None):
+        self.max_workers = max_workers
+        self.telemetry = telemetry
+        self.resilience = resilience
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.coalesced = 0
+
+    def _flight(self, model, prompt, stream, cache, feature):
+        key = cache_key(model_name_of(model), prompt)
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight
+            flight = _Flight()
+            self._inflight[key] = flight
+            self.submitted += 1
+        self._executor.submit(self._run, key, flight, model, prompt, stream, cache, feature)
+        return flight
+
+    def _run(self, key, flight, model, prompt, stream, cache, feature):
+        start = time.perf_counter()
+        target = GuardedModel(model, self.resilience, feature) if self.resilience is not None else model
+        # Chat sessions resend their whole history each turn and count it themselves, before this turn joins it
+        counter = getattr(model, "prompt_tokens", None)
+        prompt_tokens = counter(prompt) if callable(counter) else estimate_tokens(prompt)
+        try:
+            result = generate_text(target, prompt, stream=stream, on_chunk=flight.publish, cache=cache)
+        except BaseException as e:
+            self._record(feature, model, prompt_tokens, cache, None, time.perf_counter() - start, e)
+            self._finish(key)
+            flight.future.set_exception(e)
+        else:
+            self._record(feature, model, prompt_tokens, cache, result, result.elapsed, None)
+            self._finish(key)
+            flight.future.set_result(result)
+
+    def _record(self, feature, model, prompt_tokens, cache, result, elapsed, error):
+        if self.telemetry is None:
+            return
+        if cache is None:
+            cache_status = "off"
+        else:
+            cache_status = "hit" if result is not None and result.cached else "miss"
+        self.telemetry.record(
+            feature=feature,
+            model=getattr(model, "base_model_name", None) or model_name_of(model),
+            prompt_tokens=prompt_tokens,
+            response_tokens=estimate_tokens(result.text) if result is not None else 0,
+            elapsed=elapsed,
+            ttft=result.ttft if result is not None else None,
+            cache=cache_status,
+            error=type(error).__name__ if error is not None else None,
+        )
+
+    def _finish(self, key):
+        # Drop the flight before resolving it so later identical prompts start fresh (or hit the cache)
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def submit(self, model, prompt, stream=False, cache=None, feature=None):
+        """Queue a generation and return a `Future` resolving to a `GenerationResult`."""
+        return self._flight(model, prompt, stream, cache, feature).future
+
+    def generate(self, model, prompt, stream=False, on_chunk=None, cache=None, feature=None):
+        """Blocking drop-in for `generate_text` that runs on the engine.
+
+        Partial text is relayed to `on_chunk` on the calling thread, which is
+        what Streamlit needs to update placeholders.
+        """
+        flight = self._flight(model, prompt, stream, cache, feature)
+        seen = 0
+        while True:
+            with flight.changed:
+                if flight.version == seen and not flight.future.done():
+                    flight.changed.wait(timeout=0.5)
+                version, text = flight.version, flight.text
+            if on_chunk and version != seen and text:
+                on_chunk(text)
+            seen = version
+            if flight.future.done():
+                return flight.future.result()
+
+    async def agenerate(self, model, prompt, stream=False, cache=None, feature=None):
+        return await asyncio.wrap_future(self.submit(model, prompt, stream=stream, cache=cache, feature=feature))
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
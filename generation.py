@@ -0,0 +1,72 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+DEFAULT_MODEL_NAME = "gemini-2.0-flash-exp"
+
+
+@dataclass
+class GenerationResult:
+    text: str
+    ttft: Optional[float]  # seconds until the first non-empty chunk arrived
+    elapsed: float  # seconds until the full response was available
+    cached: bool = False
+    prefetched: bool = False  # generated ahead of the request by the prefetcher, not yet archived
+
+
+def _chunk_text(chunk):
+    # Blocked or empty candidates raise on `.text`, treat them as no output
+    try:
+        return chunk.text or ""
+    except (ValueError, AttributeError):
+        return ""
+
+
+def model_name_of(model):
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def generate_text(model, prompt, stream=False, on_chunk: Optional[Callable[[str], None]] = None, cache=None):
+    """Run a prompt through `model`, optionally streaming partial text to `on_chunk`.
+
+    `on_chunk` receives the accumulated text so far, which is what the UI
+    placeholders want to re-render. Without streaming the whole response is
+    the first token, so `ttft` equals `elapsed` and the two modes stay comparable.
+    When a `ResponseCache` is given, hits skip the model and fresh responses are stored.
+    """
+    start = time.perf_counter()
+
+    if cache is not None:
+        cached_text = cache.get(model_name_of(model), prompt)
+        if cached_text:
+            if on_chunk:
+                on_chunk(cached_text)
+            elapsed = time.perf_counter() - start
+            return GenerationResult(text=cached_text, ttft=elapsed, elapsed=elapsed, cached=True)
+
+    result = _generate(model, prompt, stream, on_chunk, start)
+    if cache is not None and result.text:
+        cache.put(model_name_of(model), prompt, result.text)
+    return result
+
+
+def _generate(model, prompt, stream, on_chunk, start):
+    if not stream:
+        response = model.generate_content(prompt)
+        elapsed = time.perf_counter() - start
+        text = _chunk_text(response) if response else ""
+        return GenerationResult(text=text, ttft=elapsed, elapsed=elapsed)
+
+    ttft = None
+    parts = []
+    for chunk in model.generate_content(prompt, stream=True):
+        piece = _chunk_text(chunk)
+        if not piece:
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        parts.append(piece)
+        if on_chunk:
+            on_chunk("".join(parts))
+
+    return GenerationResult(text="".join(parts), ttft=ttft, elapsed=time.perf_counter() - start)
@@ -0,0 +1,262 @@
+import atexit
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", os.path.join(".cache", "history.sqlite3"))
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "1"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "200"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (conversation_id, position)
+);
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    feature TEXT NOT NULL,
+    input TEXT NOT NULL,
+    output TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at);
+"""
+
+# External-content FTS5 indexes kept in sync by triggers, so the text is stored once
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5(input, output, content='generations', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS generations_fts_insert AFTER INSERT ON generations BEGIN
+    INSERT INTO generations_fts (rowid, input, output) VALUES (new.id, new.input, new.output);
+END;
+CREATE TRIGGER IF NOT EXISTS generations_fts_delete AFTER DELETE ON generations BEGIN
+    INSERT INTO generations_fts (generations_fts, rowid, input, output) VALUES ('delete', old.id, old.input, old.output);
+END;
+"""
+
+
+def fts_query(text):
+    # Quote every word so user input can never be parsed as FTS5 syntax; all words must match, as prefixes
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class HistoryStore:
+    """SQLite (WAL) archive of chat conversations and feature outputs with FTS5 keyword search.
+
+    Writes are queued and committed in batches by a background thread, so
+    recording a message never waits on the disk. Call `flush()` to make
+    queued writes visible immediately.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH, flush_interval=HISTORY_FLUSH_SECONDS, batch_size=HISTORY_BATCH_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.written = 0
+        self._queue = queue.Queue()
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5; search falls back to LIKE scans
+                self.full_text = False
+
+        threading.Thread(target=self._writer, name="history-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Writes
+
+    def add_message(self, conversation_id, position, role, content):
+        self._queue.put(("message", (conversation_id, position, role, content, time.time())))
+
+    def add_generation(self, feature, input_text, output):
+        self._queue.put(("generation", (feature, input_text, output, time.time())))
+
+    def _writer(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # A flush marker writes what has been gathered right away instead of waiting for the deadline
+            while len(batch) < self.batch_size and batch[-1][0] != "flush":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        messages = [args for kind, args in batch if kind == "message"]
+        generations = [args for kind, args in batch if kind == "generation"]
+        waiters = [args for kind, args in batch if kind == "flush"]
+        with self._write_lock:
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "INSERT INTO conversations (id, title, created_at, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (id) DO UPDATE SET updated_at = excluded.updated_at",
+                        [(item[0], item[3][:80], item[4], item[4]) for item in messages],
+                    )
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO messages (conversation_id, position, role, content, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        messages,
+                    )
+                    conn.executemany(
+                        "UPDATE conversations SET messages = "
+                        "(SELECT COUNT(*) FROM messages WHERE conversation_id = ?) WHERE id = ?",
+                        {(item[0], item[0]) for item in messages},
+                    )
+                    conn.executemany(
+                        "INSERT INTO generations (feature, input, output, created_at) VALUES (?, ?, ?, ?)",
+                        generations,
+                    )
+                self.written += len(messages) + len(generations)
+            except sqlite3.Error:
+                pass  # the archive is best effort and must never break the app
+            finally:
+                for done in waiters:
+                    done[0].set()
+
+    def flush(self, timeout=5):
+        """Wait until every queued write is committed; returns at once when nothing is pending."""
+        if not self._queue.unfinished_tasks:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", (done,)))
+        return done.wait(timeout)
+
+    # Reads
+
+    def search(self, text, kind=None, limit=50):
+        """Keyword search over chat messages (`kind="chat"`), generations (`"generation"`) or both.
+
+        Returns dicts with `kind`, `id`, `feature`, `snippet` and `created_at`,
+        best matches first. Chats appear once, at their best matching message.
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        results = []
+        with self._connect() as conn:
+            if kind in (None, "chat"):
+                if self.full_text:
+                    # Best message per conversation first, so one long conversation cannot crowd out the others
+                    rows = conn.execute(
+                        "SELECT m.conversation_id AS id, snippet(messages_fts, 0, '**', '**', '…', 16) AS snippet, "
+                        "m.created_at, bm25(messages_fts) AS rank FROM messages_fts "
+                        "JOIN messages m ON m.id = messages_fts.rowid WHERE messages_fts MATCH ? "
+                        "AND messages_fts.rowid IN (SELECT id FROM ("
+                        "SELECT b.id, ROW_NUMBER() OVER (PARTITION BY b.conversation_id ORDER BY f.rank) AS position "
+                        "FROM messages_fts f JOIN messages b ON b.id = f.rowid WHERE f.messages_fts MATCH ?"
+                        ") WHERE position = 1) ORDER BY rank LIMIT ?",
+                        (query, query, limit),
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        # SQLite takes the bare columns from the row that MAX() picks: the latest match
+                        "SELECT conversation_id AS id, substr(content, 1, 200) AS snippet, "
+                        "MAX(created_at) AS created_at, 0 AS rank FROM messages WHERE content LIKE ? "
+                        "GROUP BY conversation_id "
+                        "ORDER BY created_at DESC LIMIT ?",
+                        (f"%{text}%", limit),
+                    ).fetchall()
+                results.extend(dict(row, kind="chat", feature="AI Chatbot") for row in rows)
+            if kind in (None, "generation"):
+                if self.full_text:
+                    rows = conn.execute(
+                        "SELECT g.id, g.feature, snippet(generations_fts, -1, '**', '**', '…', 16) AS snippet, "
+                        "g.created_at, bm25(generations_fts) AS rank FROM generations_fts "
+                        "JOIN generations g ON g.id = generations_fts.rowid WHERE generations_fts MATCH ? "
+                        "ORDER BY rank LIMIT ?",
+                        (query, limit),
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        "SELECT id, feature, substr(output, 1, 200) AS snippet, created_at, 0 AS rank "
+                        "FROM generations WHERE input LIKE ? OR output LIKE ? ORDER BY created_at DESC LIMIT ?",
+                        (f"%{text}%", f"%{text}%", limit),
+                    ).fetchall()
+                results.extend(dict(row, kind="generation") for row in rows)
+        results.sort(key=lambda row: row["rank"])
+        return results[:limit]
+
+    def recent_conversations(self, limit=20):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, title, created_at, updated_at, messages FROM conversations "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def conversation(self, conversation_id):
+        """All `(role, content)` messages of a conversation, in order."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY position",
+                (conversation_id,),
+            ).fetchall()
+        return [(row["role"], row["content"]) for row in rows]
+
+    def generation(self, generation_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, feature, input, output, created_at FROM generations WHERE id = ?", (generation_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def stats(self):
+        with self._connect() as conn:
+            return {
+                "conversations": conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0],
+                "messages": conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0],
+                "generations": conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0],
+            }
@@ -0,0 +1,92 @@
+import os
+
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "2000"))
+
+# Share of the budget reserved for the rolling summary of older turns
+SUMMARY_SHARE = 0.25
+
+
+def estimate_tokens(text):
+    # Gemini averages roughly four characters per token for English text
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+def format_turns(turns):
+    return "\n".join(f"{role}: {content}" for role, content in turns)
+
+
+def build_summary_prompt(summary, turns, max_words):
+    return (
+        "Update the running summary of a conversation between a user and an AI assistant.\n"
+        f"Keep names, facts, decisions and open questions. Stay under {max_words} words.\n\n"
+        f"Current summary:\n{summary or '(empty)'}\n\n"
+        f"New messages:\n{format_turns(turns)}\n\n"
+        "Updated summary:"
+    )
+
+
+class ConversationMemory:
+    """Token-budgeted chat context with a rolling summary of turns that no longer fit.
+
+    The most recent turns are sent verbatim while they fit in the budget. Older
+    turns are folded into the summary exactly once, as they fall out of the
+    window, so a long chat neither loses them nor re-sends them in full.
+    """
+
+    def __init__(self, token_budget=CHAT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.summary = ""
+        self.summarized = 0  # number of history entries already folded into the summary
+        self.turn_stats = []
+
+    @property
+    def summary_budget(self):
+        return int(self.token_budget * SUMMARY_SHARE)
+
+    def reset(self):
+        self.summary = ""
+        self.summarized = 0
+        self.turn_stats = []
+
+    def _window_start(self, history):
+        # Walk back from the newest turn; the latest message is always kept
+        budget = self.token_budget - min(estimate_tokens(self.summary), self.summary_budget)
+        start = len(history)
+        used = 0
+        while start > self.summarized:
+            tokens = estimate_tokens(history[start - 1][1])
+            if start < len(history) and used + tokens > budget:
+                break
+            used += tokens
+            start -= 1
+        return start
+
+    def build_context(self, history, summarize):
+        """Return `(summary, recent_turns)` for the next prompt.
+
+        `summarize(prompt)` is called with a summary-update prompt when turns
+        drop out of the window and must return the new summary text.
+        """
+        if len(history) < self.summarized:
+            self.reset()
+
+        start = self._window_start(history)
+        if start > self.summarized:
+            dropped = history[self.summarized:start]
+            max_words = max(50, self.summary_budget * 3 // 4)
+            self.summary = summarize(build_summary_prompt(self.summary, dropped, max_words)).strip()
+            self.summarized = start
+
+        return self.summary, history[start:]
+
+    def record(self, prompt_tokens, summary_tokens=0, recent_turns=0, mode=None):
+        """Log one turn's prompt size; callers add `latency` once the response is in."""
+        self.turn_stats.append({
+            "turn": len(self.turn_stats) + 1,
+            "mode": mode,
+            "prompt_tokens": prompt_tokens,
+            "summary_tokens": summary_tokens,
+            "recent_turns": recent_turns,
+            "latency": None,
+        })
+        return self.turn_stats[-1]
@@ -0,0 +1,67 @@
+import random
+import threading
+import time
+
+
+class MockResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class MockAPIError(Exception):
+    """Stand-in for a transient API failure (429/5xx)."""
+
+    def __init__(self, message, code=503):
+        super().__init__(message)
+        self.code = code
+
+
+class MockModel:
+    """Offline stand-in for `genai.GenerativeModel` with tunable latency, streaming and errors.
+
+    `latency` is the time to the first chunk (plus up to `jitter` extra),
+    after which chunks of `chunk_words` words arrive every `chunk_interval`
+    seconds until `response_words` words have been sent. A fraction
+    `error_rate` of calls raises `MockAPIError` instead.
+    """
+
+    def __init__(self, model_name="mock-gemini", latency=0.2, jitter=0.05, chunk_interval=0.02,
+                 chunk_words=8, response_words=120, error_rate=0.0, seed=None):
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_interval = chunk_interval
+        self.chunk_words = chunk_words
+        self.response_words = response_words
+        self.error_rate = error_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        with self._lock:
+            self.calls += 1
+            return self._random.random(), self._random.random()
+
+    def _words(self, prompt):
+        vocabulary = prompt.split() or ["lorem"]
+        return [vocabulary[i % len(vocabulary)] for i in range(self.response_words)]
+
+    def _chunks(self, words):
+        for i in range(0, len(words), self.chunk_words):
+            if i:
+                time.sleep(self.chunk_interval)
+            yield MockResponse(" ".join(words[i:i + self.chunk_words]) + " ")
+
+    def generate_content(self, prompt, stream=False):
+        error_roll, jitter_roll = self._roll()
+        time.sleep(self.latency + self.jitter * jitter_roll)
+        if error_roll < self.error_rate:
+            raise MockAPIError("503 The model is overloaded. Please try again later.")
+
+        words = self._words(prompt)
+        if stream:
+            return self._chunks(words)
+        # A blocking call waits for the whole response to be generated
+        time.sleep(self.chunk_interval * (len(words) // self.chunk_words))
+        return MockResponse(" ".join(words))
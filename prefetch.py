@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from generation import model_name_of
+from response_cache import cache_key
+
+PREFETCH_SESSION_BUDGET = int(os.getenv("PREFETCH_SESSION_BUDGET", "6"))
+PREFETCH_BUDGET_WINDOW_SECONDS = float(os.getenv("PREFETCH_BUDGET_WINDOW_SECONDS", "3600"))
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "300"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+# Prefetches only start while fewer than this share of the engine's workers are busy
+PREFETCH_MAX_LOAD = float(os.getenv("PREFETCH_MAX_LOAD", "0.5"))
+
+
+class Prefetcher:
+    """Speculatively generates likely follow-up requests and keeps the results briefly.
+
+    Each session may start at most `budget` prefetches per `window` seconds.
+    Prefetches run on their own small pool and are dropped when the engine is
+    busy with foreground requests, so they only use spare capacity. Results
+    expire after `ttl` seconds; `take` hands one out at most once.
+    """
+
+    def __init__(self, engine, budget=PREFETCH_SESSION_BUDGET, window=PREFETCH_BUDGET_WINDOW_SECONDS,
+                 ttl=PREFETCH_TTL_SECONDS, workers=PREFETCH_WORKERS, max_load=PREFETCH_MAX_LOAD):
+        self.engine = engine
+        self.budget = budget
+        self.window = window
+        self.ttl = ttl
+        self.max_load = max_load
+        self.stats = {}  # kind -> {"issued", "dropped", "hits", "expired"}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._store = {}  # key -> (text, expires at, kind)
+        self._pending = set()
+        self._sessions = {}  # session id -> deque of start times within the window
+        self._lock = threading.Lock()
+
+    def _count(self, kind, name):
+        stats = self.stats.setdefault(kind, {"issued": 0, "dropped": 0, "hits": 0, "expired": 0})
+        stats[name] += 1
+
+    def _purge(self, now):
+        for key in [key for key, (_, expires, _) in self._store.items() if expires <= now]:
+            self._count(self._store.pop(key)[2], "expired")
+
+    def remaining(self, session_id):
+        with self._lock:
+            return self._remaining(session_id, time.monotonic())
+
+    def _remaining(self, session_id, now):
+        starts = self._sessions.setdefault(session_id, deque())
+        while starts and starts[0] <= now - self.window:
+            starts.popleft()
+        return self.budget - len(starts)
+
+    def schedule(self, session_id, kind, model, prompt, feature=None, cache=None):
+        """Start generating `prompt` in the background if the session has budget left. Returns whether it did."""
+        key = cache_key(model_name_of(model), prompt)
+        now = time.monotonic()
+        with self._lock:
+            if key in self._store or key in self._pending:
+                return False
+            if self._remaining(session_id, now) <= 0:
+                return False
+            self._sessions[session_id].append(now)
+            self._pending.add(key)
+            self._count(kind, "issued")
+        self._executor.submit(self._run, key, kind, model, prompt, feature, cache)
+        return True
+
+    def _run(self, key, kind, model, prompt, feature, cache):
+        text = ""
+        try:
+            if self.engine.in_flight < self.engine.max_workers * self.max_load:
+                text = self.engine.generate(model, prompt, cache=cache, feature=f"{feature} (prefetch)").text
+        except Exception:
+            pass  # a failed guess costs nothing but the attempt
+        with self._lock:
+            self._pending.discard(key)
+            if text:
+                self._store[key] = (text, time.monotonic() + self.ttl, kind)
+            else:
+                self._count(kind, "dropped")
+
+    def take(self, model, prompt, validator=None):
+        """Return and forget the text prefetched for `prompt` on `model`, or `None`.
+
+        Text that fails `validator` is discarded and counted as dropped rather than as a hit.
+        """
+        key = cache_key(model_name_of(model), prompt)
+        with self._lock:
+            self._purge(time.monotonic())
+            entry = self._store.pop(key, None)
+            if entry is None:
+                return None
+            text, _, kind = entry
+        if validator is not None and not validator(text):
+            with self._lock:
+                self._count(kind, "dropped")
+            return None
+        with self._lock:
+            self._count(kind, "hits")
+        return text
+
+    @property
+    def hit_rate(self):
+        with self._lock:
+            issued = sum(stats["issued"] for stats in self.stats.values())
+            hits = sum(stats["hits"] for stats in self.stats.values())
+        return hits / issued if issued else 0.0
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
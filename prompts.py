@@ -0,0 +1,231 @@
+import os
+import string
+import textwrap
+
+from memory import estimate_tokens
+
+CONTENT_TYPES = ["Blog Post", "Article", "Social Media Post", "Product Description", "Email", "Essay"]
+CONTENT_LENGTHS = ["Short (100-200 words)", "Medium (300-500 words)", "Long (800-1200 words)"]
+TONES = ["Professional", "Casual", "Friendly", "Formal", "Creative", "Persuasive"]
+PROGRAMMING_LANGUAGES = ["Python", "JavaScript", "Java", "C++", "C#", "Go", "Rust", "PHP", "Ruby", "Swift"]
+FILE_EXTENSIONS = {
+    "Python": "py", "JavaScript": "js", "Java": "java",
+    "C++": "cpp", "C#": "cs", "Go": "go", "Rust": "rs",
+    "PHP": "php", "Ruby": "rb", "Swift": "swift"
+}
+
+# Active variant per template, e.g. "content=lean,code=lean"; everything else uses "baseline"
+PROMPT_VARIANTS = dict(
+    item.split("=", 1) for item in os.getenv("PROMPT_VARIANTS", "").replace(" ", "").split(",") if "=" in item
+)
+
+
+class PromptTemplate:
+    """One version of a prompt, dedented and parsed once at import time."""
+
+    def __init__(self, name, version, text, variant="baseline"):
+        self.name = name
+        self.version = version
+        self.variant = variant
+        self.text = textwrap.dedent(text).strip()
+        self.fields = tuple(
+            dict.fromkeys(field for _, field, _, _ in string.Formatter().parse(self.text) if field)
+        )
+        # Fixed text billed on every call, whatever the inputs
+        self.tokens = estimate_tokens("".join(literal for literal, _, _, _ in string.Formatter().parse(self.text)))
+
+    def render(self, **values):
+        return self.text.format_map(values)
+
+
+class TemplateRegistry:
+    """Named prompt templates with versioned variants; one variant per name is active."""
+
+    def __init__(self, active=None):
+        self.templates = {}  # name -> {variant: PromptTemplate}
+        self.active = dict(active or {})
+
+    def register(self, name, version, text, variant="baseline"):
+        self.templates.setdefault(name, {})[variant] = PromptTemplate(name, version, text, variant)
+
+    def activate(self, name, variant):
+        if variant not in self.templates.get(name, {}):
+            raise KeyError(f"No '{variant}' variant of prompt '{name}'")
+        self.active[name] = variant
+
+    def get(self, name, variant=None):
+        variants = self.templates[name]
+        return variants.get(variant or self.active.get(name, "baseline")) or variants["baseline"]
+
+    def render(self, name, variant=None, **values):
+        return self.get(name, variant).render(**values)
+
+    def footprint(self):
+        """One row per template variant with its version and fixed token cost."""
+        return [
+            {
+                "name": name,
+                "variant": variant,
+                "version": template.version,
+                "active": template is self.get(name),
+                "template_tokens": template.tokens,
+            }
+            for name, variants in self.templates.items()
+            for variant, template in variants.items()
+        ]
+
+
+REGISTRY = TemplateRegistry(PROMPT_VARIANTS)
+
+REGISTRY.register("content", 1, """
+    Create a {content_type} about "{topic}" with the following specifications:
+    - Length: {length}
+    - Tone: {tone}
+    - Make it engaging, well-structured, and informative
+    - Include relevant examples where appropriate
+""")
+REGISTRY.register("content", 1, """
+    Write a {content_type} about "{topic}". Length: {length}. Tone: {tone}. Engaging and well-structured, with examples.
+""", variant="lean")
+
+REGISTRY.register("translation", 1, """
+    Translate the following text from {source_lang} to {target_lang}.
+    Provide an accurate and natural translation:
+
+    Text: {text}
+""")
+REGISTRY.register("translation", 1, """
+    Translate from {source_lang} to {target_lang}. Reply with only the translation.
+
+    {text}
+""", variant="lean")
+
+REGISTRY.register("code", 1, """
+    Generate {language} code for the following requirement:
+    {description}
+
+    Requirements:
+    - Complexity level: {complexity}
+    - Include comments: {comments}
+    - Include usage examples: {examples}
+    - Include error handling: {error_handling}
+
+    Provide clean, well-structured, and efficient code.
+""")
+REGISTRY.register("code", 1, """
+    Write {complexity} {language} code: {description}
+    {extras}Keep it clean and efficient.
+""", variant="lean")
+
+REGISTRY.register("explain", 1, """
+    Explain the following code in a {level} manner:
+
+    {code}
+
+    Please provide:
+    1. Overall purpose of the code
+    2. How it works
+    3. Key concepts used
+    4. Any potential improvements
+""")
+REGISTRY.register("explain", 1, """
+    Explain this code in a {level} manner: purpose, how it works, key concepts, improvements.
+
+    {code}
+""", variant="lean")
+
+REGISTRY.register("chat", 1, """
+    You are a helpful AI assistant. Respond to the user's message in a friendly and informative way.
+
+    {earlier}Recent conversation:
+    {context}
+
+    Please provide a helpful response to the latest user message.
+""")
+REGISTRY.register("chat", 1, """
+    You are a friendly, helpful AI assistant.
+
+    {earlier}Conversation:
+    {context}
+
+    Reply to the last user message.
+""", variant="lean")
+
+REGISTRY.register("translation_chunk", 1, """
+    Translate the following text from {source_lang} to {target_lang}.
+    It is part {index} of {total} of a longer document. Translate only this part and reply with only the translation.
+    Provide an accurate and natural translation:
+
+    Text: {chunk}
+""")
+
+REGISTRY.register("explain_chunk", 1, """
+    The following is part {index} of {total} of a larger source file.
+    Describe in a {level} manner what this part does, the functions and classes it defines,
+    the key concepts used and any potential improvements. Be concise.
+
+    {chunk}
+""")
+
+REGISTRY.register("explain_synthesis", 1, """
+    Below are notes on consecutive parts of one source file.
+    Combine them into a single explanation of the whole file in a {level} manner.
+
+    {sections}
+
+    Please provide:
+    1. Overall purpose of the code
+    2. How it works
+    3. Key concepts used
+    4. Any potential improvements
+""")
+
+
+def build_content_prompt(topic, content_type, length, tone, variant=None):
+    return REGISTRY.render(
+        "content", variant, topic=topic, content_type=content_type.lower(), length=length, tone=tone
+    )
+
+
+def build_translation_prompt(text, source_lang, target_lang, variant=None):
+    return REGISTRY.render("translation", variant, text=text, source_lang=source_lang, target_lang=target_lang)
+
+
+def build_code_prompt(code_description, programming_lang, complexity,
+                      include_comments, include_examples, include_error_handling, variant=None):
+    extras = "".join(
+        f"{phrase}. " for phrase, wanted in (
+            ("Add comments", include_comments),
+            ("Add usage examples", include_examples),
+            ("Handle errors", include_error_handling),
+        ) if wanted
+    )
+    return REGISTRY.render(
+        "code", variant, language=programming_lang, description=code_description, complexity=complexity,
+        comments=include_comments, examples=include_examples, error_handling=include_error_handling, extras=extras
+    )
+
+
+def build_explain_prompt(code, explanation_level, variant=None):
+    return REGISTRY.render("explain", variant, code=code, level=explanation_level.lower())
+
+
+def build_chat_prompt(summary, recent_turns, variant=None):
+    context = "\n".join([f"{role}: {content}" for role, content in recent_turns])
+    earlier = f"Summary of earlier conversation:\n{summary}\n\n" if summary else ""
+    return REGISTRY.render("chat", variant, earlier=earlier, context=context)
+
+
+def build_translation_chunk_prompt(chunk, index, total, source_lang, target_lang):
+    return REGISTRY.render(
+        "translation_chunk", chunk=chunk, index=index, total=total, source_lang=source_lang, target_lang=target_lang
+    )
+
+
+def build_explain_chunk_prompt(chunk, index, total, explanation_level):
+    return REGISTRY.render("explain_chunk", chunk=chunk, index=index, total=total, level=explanation_level.lower())
+
+
+def build_explain_synthesis_prompt(section_notes, explanation_level):
+    sections = "\n\n".join(f"Part {i}:\n{note}" for i, note in enumerate(section_notes, start=1))
+    return REGISTRY.render("explain_synthesis", sections=sections, level=explanation_level.lower())
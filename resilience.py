@@ -0,0 +1,197 @@
+import os
+import random
+import threading
+import time
+
+RATE_LIMIT_RPM = float(os.getenv("RATE_LIMIT_RPM", "60"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = float(os.getenv("BACKOFF_BASE_SECONDS", "1"))
+BACKOFF_MAX_SECONDS = float(os.getenv("BACKOFF_MAX_SECONDS", "30"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# google.api_core exception classes for quota and transient server errors
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "ConnectionError", "Timeout",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+def is_retryable(error):
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = None
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class TokenBucket:
+    """Client-side rate limiter: `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive transient failures and fails fast for `reset_timeout` seconds.
+
+    After the timeout a single trial call is let through (half-open); its
+    outcome closes the circuit again or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Gemini API is temporarily unavailable; requests are paused for {remaining:.0f}s"
+                    )
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpenError("Gemini API is recovering; waiting for a trial request to finish")
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def release(self):
+        # The call failed for a reason unrelated to API health; let the next call be the trial
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResiliencePolicy:
+    """Rate limiting, retries with exponential backoff and full jitter, and a circuit breaker.
+
+    Counters are reported to `telemetry` when one is given.
+    """
+
+    def __init__(self, rpm=RATE_LIMIT_RPM, burst=RATE_LIMIT_BURST, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS,
+                 failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_SECONDS,
+                 telemetry=None, bucket=None):
+        # `bucket` replaces the in-process limiter, e.g. with a quota shared by several processes
+        if bucket is None and rpm > 0:
+            bucket = TokenBucket(rpm / 60.0, burst)
+        self.bucket = bucket
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.telemetry = telemetry
+        self.retries = 0
+        self.throttle_wait = 0.0
+        self.rejections = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1, **labels):
+        if self.telemetry is not None:
+            self.telemetry.increment(name, amount, **labels)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, fn, feature=None):
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                with self._lock:
+                    self.rejections += 1
+                self._count("assistant_circuit_rejections_total", feature=feature)
+                raise
+
+            if self.bucket is not None:
+                waited = self.bucket.acquire()
+                if waited:
+                    with self._lock:
+                        self.throttle_wait += waited
+                    self._count("assistant_throttle_wait_seconds_total", waited, feature=feature)
+
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    # Bad requests say nothing about API health
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or self.breaker.state == CircuitBreaker.OPEN:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                self._count("assistant_retries_total", feature=feature, error=type(e).__name__)
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+
+
+class GuardedModel:
+    """Model proxy whose `generate_content` calls go through a `ResiliencePolicy`."""
+
+    def __init__(self, model, policy, feature=None):
+        self._model = model
+        self._policy = policy
+        self._feature = feature
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def generate_content(self, prompt, stream=False):
+        return self._policy.call(lambda: self._model.generate_content(prompt, stream=stream), self._feature)
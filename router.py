@@ -0,0 +1,160 @@
+import ast
+import os
+import re
+import threading
+
+from generation import DEFAULT_MODEL_NAME
+
+ROUTER_MODELS = [name.strip() for name in os.getenv(
+    "ROUTER_MODELS", f"{DEFAULT_MODEL_NAME},gemini-1.5-flash,gemini-1.5-pro"
+).split(",") if name.strip()]
+# Cheapest/fastest first; each later model is only tried when the previous output fails validation
+CASCADE_MODELS = [name.strip() for name in os.getenv(
+    "CASCADE_MODELS", f"gemini-1.5-flash,{DEFAULT_MODEL_NAME}"
+).split(",") if name.strip()]
+CASCADE = "⚡ Cascade (cheap first)"
+
+_CODE_BLOCK = re.compile(r"```([^\n]*)\n(.*?)```", re.S)
+_BRACKETS = {")": "(", "]": "[", "}": "{"}
+# Fence tags that mark a block as written in each Code Generator language
+LANGUAGE_TAGS = {
+    "Python": {"python", "py", "python3"},
+    "JavaScript": {"javascript", "js", "node"},
+    "Java": {"java"},
+    "C++": {"cpp", "c++", "cc", "cxx"},
+    "C#": {"csharp", "cs", "c#"},
+    "Go": {"go", "golang"},
+    "Rust": {"rust", "rs"},
+    "PHP": {"php"},
+    "Ruby": {"ruby", "rb"},
+    "Swift": {"swift"},
+}
+
+
+def validate_non_empty(text):
+    return bool(text and text.strip())
+
+
+def _code_blocks(text, language):
+    """Fenced blocks tagged with `language` or untagged; shell steps and sample output are not checked."""
+    blocks = _CODE_BLOCK.findall(text)
+    if not blocks:
+        return [text]
+    tags = LANGUAGE_TAGS.get(language, {language.lower()})
+    return [code for tag, code in blocks if not tag.strip() or tag.strip().lower() in tags]
+
+
+def _balanced(code):
+    # Strip string literals and comments, then check that brackets pair up
+    code = re.sub(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|#[^\n]*|/\*.*?\*/', "", code, flags=re.S)
+    stack = []
+    for char in code:
+        if char in "([{":
+            stack.append(char)
+        elif char in _BRACKETS:
+            if not stack or stack.pop() != _BRACKETS[char]:
+                return False
+    return not stack
+
+
+def code_validator(language):
+    """Python code must parse; other languages must at least have balanced brackets."""
+    def validate(text):
+        if not validate_non_empty(text):
+            return False
+        blocks = _code_blocks(text, language)
+        if not blocks:
+            return False  # fenced code, but none of it in the requested language
+        for block in blocks:
+            if language == "Python":
+                if block.lstrip().startswith(">>>"):
+                    continue  # interactive session, not a module
+                try:
+                    ast.parse(block)
+                except SyntaxError:
+                    return False
+            elif not _balanced(block):
+                return False
+        return True
+    return validate
+
+
+def length_validator(length_label, tolerance=0.25):
+    """Word count must fall within the range in a label such as "Short (100-200 words)", give or take `tolerance`."""
+    match = re.search(r"(\d+)\s*-\s*(\d+)", length_label)
+    if not match:
+        return validate_non_empty
+    low, high = int(match.group(1)), int(match.group(2))
+
+    def validate(text):
+        words = len(text.split()) if text else 0
+        return low * (1 - tolerance) <= words <= high * (1 + tolerance)
+    return validate
+
+
+class ModelRouter:
+    """Picks the model for each request: a fixed model, or a cheap-first cascade with validation.
+
+    Models come from `factory(name)`, which the app backs with a per-name
+    `st.cache_resource`, so each model is created on first use only.
+    """
+
+    def __init__(self, factory, cascade_models=CASCADE_MODELS, telemetry=None):
+        self.factory = factory
+        self.cascade_models = cascade_models
+        self.telemetry = telemetry
+        self.model_stats = {}  # name -> {"calls", "seconds", "errors"}
+        self.cascade_stats = {}  # feature -> {"requests", "escalated", "escalations"}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        return self.factory(name)
+
+    def _observe(self, name, seconds, error):
+        with self._lock:
+            stats = self.model_stats.setdefault(name, {"calls": 0, "seconds": 0.0, "errors": 0})
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["errors"] += 1 if error else 0
+
+    def _run(self, engine, name, prompt, feature, **kwargs):
+        try:
+            result = engine.generate(self.get(name), prompt, feature=feature, **kwargs)
+        except Exception:
+            self._observe(name, 0.0, True)
+            raise
+        self._observe(name, result.elapsed, False)
+        return result
+
+    def generate(self, engine, choice, prompt, validator=validate_non_empty, feature=None, **kwargs):
+        """Generate with model `choice`, or walk the cascade when `choice` is `CASCADE`.
+
+        Returns `(result, model_name)`. Extra keyword arguments go to `engine.generate`.
+        """
+        if choice != CASCADE:
+            return self._run(engine, choice, prompt, feature, **kwargs), choice
+
+        with self._lock:
+            stats = self.cascade_stats.setdefault(feature, {"requests": 0, "escalated": 0, "escalations": 0})
+            stats["requests"] += 1
+        for position, name in enumerate(self.cascade_models):
+            last = position == len(self.cascade_models) - 1
+            try:
+                result = self._run(engine, name, prompt, feature, **kwargs)
+            except Exception:
+                if last:
+                    raise
+                result = None
+            if last or (result is not None and validator(result.text)):
+                return result, name
+            with self._lock:
+                stats["escalated"] += 1 if position == 0 else 0
+                stats["escalations"] += 1
+            if self.telemetry is not None:
+                self.telemetry.increment("assistant_escalations_total", feature=feature, model=name)
+
+    def escalation_rate(self, feature):
+        """Share of cascaded requests for `feature` that needed more than the first model."""
+        with self._lock:
+            stats = self.cascade_stats.get(feature)
+            return stats["escalated"] / stats["requests"] if stats and stats["requests"] else 0.0
@@ -0,0 +1,174 @@
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from response_cache import cache_key
+
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "2048"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+# Long questions that differ in a single word still score above 0.9, so the bar is set high
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+
+# Operators and punctuation are tokens too, so "a > b" and "a < b" do not look alike
+_TOKEN = re.compile(r"\w+|[^\w\s]+")
+# Words and sentence punctuation a rewording may add, drop or swap without changing the question
+_STOPWORDS = frozenset("""
+a an the this that these those is are was were be been being am do does did have has had
+i me my we our you your it its he she they them their to of in on at for from by with about into
+and or but so if then than as please can could would should will shall may might must
+what which who whom how why when where tell give show explain write make some any just
+. , ? ! ; : ' " ...
+""".split())
+
+
+def _features(text):
+    words = _TOKEN.findall(text.lower())
+    yield from words
+    yield from (f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"<{word}>"
+        yield from (padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def content_words(text):
+    """Tokens of `text` that carry meaning: everything but stopwords and sentence punctuation."""
+    return frozenset(token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS)
+
+
+def embed(text, dim=SEMANTIC_CACHE_DIM):
+    """Unit-length hashed bag of tokens (words and operators), token bigrams and character trigrams."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        # The top bit picks the sign so unrelated collisions cancel out on average
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """In-memory nearest-neighbour tier in front of the exact `ResponseCache`.
+
+    Only the user's free text (`query`) is matched by cosine similarity; the
+    rest of the prompt (template, options, chat history) and the model must be
+    identical, so a hit never reuses an answer given under different settings.
+    A close match must also use the same content words, so "an itinerary for
+    Japan" never gets the answer cached for "an itinerary for Italy".
+    Entries live in one preallocated matrix and the least recently used one is
+    overwritten once `max_entries` is reached.
+    """
+
+    def __init__(self, exact=None, dim=SEMANTIC_CACHE_DIM, max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                 thresholds=None, default_threshold=SEMANTIC_CACHE_THRESHOLD):
+        self.exact = exact
+        self.dim = dim
+        self.max_entries = max_entries
+        self.thresholds = dict(thresholds or {})  # per-feature overrides of `default_threshold`
+        self.default_threshold = default_threshold
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.feature_hits = {}
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._contexts = np.zeros(max_entries, dtype=np.int64)
+        self._last_access = np.zeros(max_entries, dtype=np.float64)
+        self._entries = [None] * max_entries  # (response, seconds it took to generate, content words)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def threshold(self, feature):
+        return self.thresholds.get(feature, self.default_threshold)
+
+    def view(self, feature, query):
+        """A cache object for one request, usable wherever a `ResponseCache` is accepted."""
+        return _SemanticView(self, feature, query)
+
+    def lookup(self, context, query, feature=None):
+        """Return `(response, similarity)` for the closest entry above the feature threshold, else `None`."""
+        vector = embed(query, self.dim)
+        words = content_words(query)
+        threshold = self.threshold(feature)
+        with self._lock:
+            if self._size:
+                candidates = np.flatnonzero(self._contexts[:self._size] == context)
+                if candidates.size:
+                    similarities = self._vectors[candidates] @ vector
+                    for best in np.argsort(-similarities):
+                        if similarities[best] < threshold:
+                            break
+                        slot = candidates[best]
+                        response, seconds, entry_words = self._entries[slot]
+                        if entry_words != words:
+                            continue
+                        self._last_access[slot] = time.monotonic()
+                        self.hits += 1
+                        self.saved_seconds += seconds
+                        self.feature_hits[feature] = self.feature_hits.get(feature, 0) + 1
+                        return response, float(similarities[best])
+            self.misses += 1
+        return None
+
+    def add(self, context, query, response, seconds=0.0):
+        vector = embed(query, self.dim)
+        with self._lock:
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_access))
+            self._vectors[slot] = vector
+            self._contexts[slot] = context
+            self._last_access[slot] = time.monotonic()
+            self._entries[slot] = (response, seconds, content_words(query))
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._entries = [None] * self.max_entries
+            self.hits = 0
+            self.misses = 0
+            self.saved_seconds = 0.0
+            self.feature_hits = {}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _SemanticView:
+    def __init__(self, cache, feature, query):
+        self.cache = cache
+        self.feature = feature
+        self.query = query
+        self._started = None
+
+    def _context(self, model_name, prompt):
+        # Everything but the query must match exactly; fold it into one comparable integer
+        key = cache_key(f"{self.feature}\x00{model_name}", prompt.replace(self.query, "\x00"))
+        return int(key[:15], 16)
+
+    def get(self, model_name, prompt):
+        self._started = time.perf_counter()
+        if self.cache.exact is not None:
+            response = self.cache.exact.get(model_name, prompt)
+            if response:
+                return response
+        if not self.query:
+            return None
+        match = self.cache.lookup(self._context(model_name, prompt), self.query, self.feature)
+        return match[0] if match else None
+
+    def put(self, model_name, prompt, response):
+        if self.cache.exact is not None:
+            self.cache.exact.put(model_name, prompt, response)
+        if self.query and response:
+            seconds = time.perf_counter() - self._started if self._started is not None else 0.0
+            self.cache.add(self._context(model_name, prompt), self.query, response, seconds)
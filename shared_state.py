@@ -0,0 +1,453 @@
+"""Shared state for running several app or API processes behind one load balancer.
+
+Chat histories, response caches and quota counters normally live inside
+one process. Setting `SHARED_STATE_URL` moves them to a backend that every
+replica opens:
+
+    sqlite:///.cache/shared_state.sqlite3   one machine, any number of processes
+    redis://host:6379/0                     several machines (needs the `redis` package)
+    memory://                               in-process Redis stand-in, for tests
+
+Backends expose a small Redis-like command set (`get`, `set`, `delete`,
+`incr`, `rpush`, `lrange`, `llen`, `count`, `delete_prefix`, `trim`), so
+the stores below work unchanged on any of them.
+"""
+import fnmatch
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from chat_history import CHAT_SPILL_MAX_AGE_DAYS
+from resilience import RATE_LIMIT_BURST, RATE_LIMIT_RPM
+from response_cache import CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, cache_key
+
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "")
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "aiap:")
+# Expired rows are deleted by the next write after this many seconds, so the file does not grow forever
+SHARED_STATE_PURGE_SECONDS = float(os.getenv("SHARED_STATE_PURGE_SECONDS", "60"))
+
+
+class SQLiteBackend:
+    """Shared state in one SQLite file (WAL), safe for many processes on the same machine."""
+
+    def __init__(self, path, purge_interval=SHARED_STATE_PURGE_SECONDS):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._purged_at = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value, expires_at REAL, accessed_at REAL)"
+            )
+            if "accessed_at" not in {row[1] for row in conn.execute("PRAGMA table_info(kv)")}:
+                conn.execute("ALTER TABLE kv ADD COLUMN accessed_at REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lists ("
+                "key TEXT NOT NULL, position INTEGER NOT NULL, value TEXT NOT NULL, PRIMARY KEY (key, position))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS list_expiry (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS list_expiry_expires_at ON list_expiry (expires_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _purge(self, conn, now):
+        if now - self._purged_at >= self.purge_interval:
+            self._purged_at = now
+            conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM lists WHERE key IN (SELECT key FROM list_expiry WHERE expires_at <= ?)", (now,))
+            conn.execute("DELETE FROM list_expiry WHERE expires_at <= ?", (now,))
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            if row is not None:
+                # Recency for `trim`, like the least recently used eviction of `ResponseCache`
+                conn.execute("UPDATE kv SET accessed_at = ? WHERE key = ?", (now, key))
+        return None if row is None else row[0]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._connect() as conn:
+            self._purge(conn, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl if ttl else None, now),
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            conn.execute("DELETE FROM lists WHERE key = ?", (key,))
+            conn.execute("DELETE FROM list_expiry WHERE key = ?", (key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        """Atomically add `amount` to an integer counter and return the new value."""
+        now = time.time()
+        with self._connect() as conn:
+            # The first write takes SQLite's write lock, so the read below sees no other writer
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, now))
+            self._purge(conn, now)
+            conn.execute(
+                "INSERT INTO kv (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value, "
+                "accessed_at = excluded.accessed_at",
+                (key, amount, now + ttl if ttl else None, now),
+            )
+            return conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()[0]
+
+    def rpush(self, key, *values, ttl=None):
+        """Append `values` to the list at `key` and return its new length; `ttl` restarts the list's expiry."""
+        now = time.time()
+        with self._connect() as conn:
+            self._purge(conn, now)
+            self._drop_expired_list(conn, key, now)
+            if ttl:
+                conn.execute(
+                    "INSERT OR REPLACE INTO list_expiry (key, expires_at) VALUES (?, ?)", (key, now + ttl)
+                )
+            for value in values:
+                conn.execute(
+                    "INSERT INTO lists (key, position, value) "
+                    "SELECT ?, COALESCE(MAX(position), -1) + 1, ? FROM lists WHERE key = ?",
+                    (key, value, key),
+                )
+            return conn.execute("SELECT COUNT(*) FROM lists WHERE key = ?", (key,)).fetchone()[0]
+
+    def _drop_expired_list(self, conn, key, now):
+        # Expired lists are removed as soon as they are touched, like expired `kv` rows are skipped
+        if conn.execute("SELECT 1 FROM list_expiry WHERE key = ? AND expires_at <= ?", (key, now)).fetchone():
+            conn.execute("DELETE FROM lists WHERE key = ?", (key,))
+            conn.execute("DELETE FROM list_expiry WHERE key = ?", (key,))
+
+    def lrange(self, key, start=0, end=-1):
+        """Items `start` to `end` inclusive; negative indexes count from the end, as in Redis."""
+        with self._connect() as conn:
+            self._drop_expired_list(conn, key, time.time())
+            length = conn.execute("SELECT COUNT(*) FROM lists WHERE key = ?", (key,)).fetchone()[0]
+            start, end = _list_bounds(start, end, length)
+            if start > end:
+                return []
+            rows = conn.execute(
+                "SELECT value FROM lists WHERE key = ? ORDER BY position LIMIT ? OFFSET ?",
+                (key, end - start + 1, start),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def llen(self, key):
+        with self._connect() as conn:
+            self._drop_expired_list(conn, key, time.time())
+            return conn.execute("SELECT COUNT(*) FROM lists WHERE key = ?", (key,)).fetchone()[0]
+
+    def count(self, prefix):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+                (*_prefix_range(prefix), time.time()),
+            ).fetchone()[0]
+
+    def delete_prefix(self, prefix):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM kv WHERE key >= ? AND key < ?", _prefix_range(prefix))
+            conn.execute("DELETE FROM lists WHERE key >= ? AND key < ?", _prefix_range(prefix))
+            conn.execute("DELETE FROM list_expiry WHERE key >= ? AND key < ?", _prefix_range(prefix))
+
+    def trim(self, prefix, max_entries):
+        """Delete the least recently used keys under `prefix` beyond `max_entries`."""
+        with self._connect() as conn:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM kv WHERE key >= ? AND key < ?", _prefix_range(prefix)
+            ).fetchone()[0]
+            if count > max_entries:
+                conn.execute(
+                    "DELETE FROM kv WHERE key IN "
+                    "(SELECT key FROM kv WHERE key >= ? AND key < ? ORDER BY accessed_at ASC LIMIT ?)",
+                    (*_prefix_range(prefix), count - max_entries),
+                )
+
+
+def _prefix_range(prefix):
+    # Keys compare as UTF-8 bytes, and no character sorts after U+10FFFF, so the primary key index serves the range
+    return prefix, prefix + "\U0010ffff"
+
+
+def _list_bounds(start, end, length):
+    if start < 0:
+        start = max(0, length + start)
+    if end < 0:
+        end = length + end
+    return start, min(end, length - 1)
+
+
+class RedisBackend:
+    """Shared state on a Redis-compatible server, or on any client object with redis-py's command methods."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_STATE_URL points at Redis but the `redis` package is not installed")
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=int(math.ceil(ttl)) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key, amount=1, ttl=None):
+        value = self.client.incrby(key, amount)
+        if ttl and value == amount:
+            # Only the call that created the counter starts its expiry
+            self.client.expire(key, int(math.ceil(ttl)))
+        return value
+
+    def rpush(self, key, *values, ttl=None):
+        length = self.client.rpush(key, *values)
+        if ttl:
+            self.client.expire(key, int(math.ceil(ttl)))
+        return length
+
+    def lrange(self, key, start=0, end=-1):
+        return self.client.lrange(key, start, end)
+
+    def llen(self, key):
+        return self.client.llen(key)
+
+    def count(self, prefix):
+        return sum(1 for _ in self.client.scan_iter(match=f"{prefix}*", count=1000))
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=f"{prefix}*", count=1000))
+        for start in range(0, len(keys), 500):
+            self.client.delete(*keys[start:start + 500])
+
+    def trim(self, prefix, max_entries):
+        # Counting keys would mean a full scan per write; Redis bounds its size with the server's
+        # maxmemory-policy (use allkeys-lru) and expires entries on their own
+        pass
+
+
+class FakeRedis:
+    """In-process stand-in for the redis-py client, covering the commands `RedisBackend` uses."""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, name):
+        with self._lock:
+            return self._data[name] if self._live(name) and not isinstance(self._data[name], list) else None
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = str(value)
+            if ex:
+                self._expires[name] = time.monotonic() + ex
+            else:
+                self._expires.pop(name, None)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            removed = sum(1 for name in names if self._live(name))
+            for name in names:
+                self._data.pop(name, None)
+                self._expires.pop(name, None)
+        return removed
+
+    def incrby(self, name, amount=1):
+        with self._lock:
+            value = int(self._data[name]) + amount if self._live(name) else amount
+            self._data[name] = str(value)
+            return value
+
+    def expire(self, name, time_seconds):
+        with self._lock:
+            if not self._live(name):
+                return False
+            self._expires[name] = time.monotonic() + time_seconds
+            return True
+
+    def rpush(self, name, *values):
+        with self._lock:
+            items = self._data[name] if self._live(name) else self._data.setdefault(name, [])
+            items.extend(str(value) for value in values)
+            return len(items)
+
+    def lrange(self, name, start, end):
+        with self._lock:
+            items = self._data[name] if self._live(name) else []
+            start, end = _list_bounds(start, end, len(items))
+            return items[start:end + 1]
+
+    def llen(self, name):
+        with self._lock:
+            return len(self._data[name]) if self._live(name) else 0
+
+    def scan_iter(self, match=None, count=None):
+        with self._lock:
+            keys = [key for key in list(self._data) if self._live(key)]
+        return iter([key for key in keys if match is None or fnmatch.fnmatchcase(key, match)])
+
+
+def open_backend(url=SHARED_STATE_URL):
+    """Open the backend for `url`, or return `None` when shared state is not configured."""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend.from_url(url)
+    if url.startswith("memory://"):
+        return RedisBackend(FakeRedis())
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+
+class SharedResponseCache:
+    """Response cache with the `ResponseCache` interface, stored in a shared backend.
+
+    Entries expire after `ttl`. On SQLite the least recently used ones are
+    evicted beyond `max_entries`; a Redis server evicts by its own memory policy.
+    """
+
+    def __init__(self, backend, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, prefix=SHARED_STATE_PREFIX):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = f"{prefix}response:"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, model_name, prompt):
+        response = self.backend.get(self.prefix + cache_key(model_name, prompt))
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def put(self, model_name, prompt, response):
+        if response:
+            self.backend.set(self.prefix + cache_key(model_name, prompt), response, ttl=self.ttl)
+            self.backend.trim(self.prefix, self.max_entries)
+
+    def clear(self):
+        self.backend.delete_prefix(self.prefix)
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return self.backend.count(self.prefix)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SharedChatLog:
+    """Chat messages per conversation id, so any replica can restore a conversation.
+
+    A conversation expires `ttl` seconds after its last message, the same idle
+    time after which a session's local spill log is deleted.
+    """
+
+    def __init__(self, backend, ttl=CHAT_SPILL_MAX_AGE_DAYS * 86400, prefix=SHARED_STATE_PREFIX):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = f"{prefix}chat:"
+
+    def append(self, conversation_id, role, content):
+        return self.backend.rpush(self.prefix + conversation_id, json.dumps([role, content]), ttl=self.ttl)
+
+    def messages(self, conversation_id):
+        """The conversation as `(role, content)` pairs, oldest first."""
+        return [tuple(json.loads(item)) for item in self.backend.lrange(self.prefix + conversation_id)]
+
+    def replace(self, conversation_id, messages):
+        key = self.prefix + conversation_id
+        self.backend.delete(key)
+        if messages:
+            self.backend.rpush(key, *(json.dumps([role, content]) for role, content in messages), ttl=self.ttl)
+
+    def __contains__(self, conversation_id):
+        return self.backend.llen(self.prefix + conversation_id) > 0
+
+
+class SharedRateLimiter:
+    """Request quota shared by every process, with the `TokenBucket.acquire` interface.
+
+    Time is cut into windows of `capacity / rate` seconds, each allowing
+    `capacity` requests, so the long-run rate matches the token bucket's and
+    only one atomic counter increment is needed per request.
+    """
+
+    def __init__(self, backend, rate, capacity, name="gemini", prefix=SHARED_STATE_PREFIX):
+        self.backend = backend
+        self.rate = rate
+        self.capacity = capacity
+        self.window = capacity / rate
+        self.prefix = f"{prefix}quota:{name}:"
+        self.last_window = None  # window of the latest grant from this object
+
+    def acquire(self):
+        """Take one request from the current window, sleeping until a window has room. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            now = time.time()
+            window = int(now // self.window)
+            used = int(self.backend.incr(f"{self.prefix}{window}", ttl=self.window * 2))
+            if used <= self.capacity:
+                self.last_window = window
+                return waited
+            delay = (window + 1) * self.window - now
+            time.sleep(delay)
+            waited += delay
+
+    def used(self):
+        """Requests counted in the current window across all processes."""
+        value = self.backend.get(f"{self.prefix}{int(time.time() // self.window)}")
+        return int(value) if value is not None else 0
+
+
+def shared_rate_limiter(backend, rpm=RATE_LIMIT_RPM, burst=RATE_LIMIT_BURST):
+    """Quota for `ResiliencePolicy(bucket=...)`, or `None` without a backend or a rate limit."""
+    if backend is None or rpm <= 0:
+        return None
+    return SharedRateLimiter(backend, rpm / 60.0, burst)
@@ -0,0 +1,164 @@
+"""Load-test the shared state backend from several worker processes, as replicas would use it.
+
+Every process appends to one shared chat and its own chat, writes and reads
+response cache entries (including ones other processes wrote) and takes
+requests from the shared quota. Afterwards the totals are checked across
+processes. Examples:
+    python shared_state_loadtest.py                                  # SQLite file in a temp directory
+    python shared_state_loadtest.py --processes 16 --ops 500 --rpm 30000 --burst 50
+    python shared_state_loadtest.py --url redis://localhost:6379/15  # needs the `redis` package
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from bench import percentile
+from shared_state import SharedChatLog, SharedRateLimiter, SharedResponseCache, open_backend
+
+SHARED_CHAT = "loadtest-shared"
+OPERATIONS = ("chat", "cache_put", "cache_get", "quota")
+
+
+def run_worker(url, worker, args):
+    backend = open_backend(url)
+    chats = SharedChatLog(backend, prefix=args.prefix)
+    cache = SharedResponseCache(backend, prefix=args.prefix)
+    limiter = SharedRateLimiter(backend, args.rpm / 60.0, args.burst, prefix=args.prefix) if args.rpm else None
+    latencies = {name: [] for name in OPERATIONS}
+    cross_hits = 0
+    quota_wait = 0.0
+    quota_windows = []
+
+    def timed(name, fn, *call_args):
+        start = time.perf_counter()
+        value = fn(*call_args)
+        latencies[name].append(time.perf_counter() - start)
+        return value
+
+    start = time.perf_counter()
+    for n in range(args.ops):
+        timed("chat", chats.append, SHARED_CHAT, "user", f"worker {worker} message {n}")
+        chats.append(f"loadtest-{worker}", "user", str(n))
+        timed("cache_put", cache.put, "loadtest", f"worker {worker} prompt {n}", f"answer {worker}/{n}")
+        # Read what the neighbouring process wrote a moment ago
+        neighbour = (worker + 1) % args.processes
+        if timed("cache_get", cache.get, "loadtest", f"worker {neighbour} prompt {max(0, n - 1)}") is not None:
+            cross_hits += 1
+        if limiter is not None:
+            quota_wait += timed("quota", limiter.acquire)
+            quota_windows.append(limiter.last_window)
+    return {
+        "worker": worker,
+        "seconds": time.perf_counter() - start,
+        "latencies": latencies,
+        "cross_hits": cross_hits,
+        "quota_wait": quota_wait,
+        "quota_windows": quota_windows,
+    }
+
+
+def _worker_entry(payload):
+    return run_worker(*payload)
+
+
+def check_consistency(url, args):
+    """`(name, passed, detail)` for each cross-process invariant."""
+    backend = open_backend(url)
+    chats = SharedChatLog(backend, prefix=args.prefix)
+    cache = SharedResponseCache(backend, prefix=args.prefix)
+    shared = chats.messages(SHARED_CHAT)
+    expected = args.processes * args.ops
+    per_worker = [len(chats.messages(f"loadtest-{worker}")) for worker in range(args.processes)]
+    in_order = all(
+        [int(content.rsplit(" ", 1)[1]) for _, content in shared if content.startswith(f"worker {worker} ")]
+        == list(range(args.ops))
+        for worker in range(args.processes)
+    )
+    missing = sum(
+        1 for worker in range(args.processes) for n in range(args.ops)
+        if cache.get("loadtest", f"worker {worker} prompt {n}") != f"answer {worker}/{n}"
+    )
+    return [
+        ("shared chat has every message", len(shared) == expected, f"{len(shared)}/{expected}"),
+        ("each process's messages in order", in_order, ""),
+        ("per-process chats complete", all(count == args.ops for count in per_worker), f"{sum(per_worker)}/{expected}"),
+        ("cache entries visible to all", missing == 0, f"{missing} missing"),
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the shared state backend from several processes.")
+    parser.add_argument("--url", help="Backend URL (default: a new SQLite file in a temp directory)")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="Iterations per process")
+    # The default quota is well below what the workers ask for, so the limiter really has to hold them back
+    parser.add_argument("--rpm", type=float, default=6000, help="Shared quota in requests/minute (0: off)")
+    parser.add_argument("--burst", type=int, default=20, help="Requests allowed per quota window")
+    parser.add_argument("--prefix", default=f"loadtest:{os.getpid()}:",
+                        help="Key prefix, so runs against a shared server do not collide")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='shared_state_'), 'state.sqlite3')}"
+    if url.startswith("memory://"):
+        raise SystemExit("memory:// lives inside one process; use sqlite:/// or redis:// for a multi-process test")
+    open_backend(url)  # create the schema before the workers race for it
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        results = pool.map(_worker_entry, [(url, worker, args) for worker in range(args.processes)])
+    wall = time.perf_counter() - start
+
+    print(f"{args.processes} processes x {args.ops} iterations against {url} in {wall:.2f}s")
+    header = f"{'operation':<10} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ops/s':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = []
+    for name in OPERATIONS:
+        values = [value for result in results for value in result["latencies"][name]]
+        if not values:
+            continue
+        row = {
+            "operation": name, "count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95),
+            "p99": percentile(values, 99), "ops_per_sec": len(values) / wall,
+        }
+        rows.append(row)
+        print(
+            f"{name:<10} {row['count']:>7} {row['p50'] * 1000:>8.2f} {row['p95'] * 1000:>8.2f} "
+            f"{row['p99'] * 1000:>8.2f} {row['ops_per_sec']:>9.0f}"
+        )
+
+    grants = args.processes * args.ops
+    if args.rpm:
+        # Every grant names its window, so the per-window totals across processes can be checked exactly
+        per_window = Counter(window for result in results for window in result["quota_windows"])
+        busiest = max(per_window.values())
+        print(f"\nQuota: {grants} requests over {len(per_window)} windows, busiest {busiest}/{args.burst}, "
+              f"{sum(result['quota_wait'] for result in results):.2f}s waited in total")
+    print(f"Cross-process cache hits: {sum(result['cross_hits'] for result in results)}/{grants}\n")
+
+    checks = check_consistency(url, args)
+    if args.rpm:
+        checks.append(("quota never exceeded in any window", busiest <= args.burst, f"busiest {busiest}/{args.burst}"))
+    for name, passed, detail in checks:
+        print(f"{'PASS' if passed else 'FAIL'}  {name}{f' ({detail})' if detail else ''}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"wall_seconds": wall, "operations": rows,
+                       "checks": [{"name": name, "passed": passed, "detail": detail}
+                                  for name, passed, detail in checks]}, f, indent=2)
+    if not all(passed for _, passed, _ in checks):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """Process-wide record of one-time startup costs (imports, configuration, first render).
+
+    Each phase keeps the first measurement only, so later reruns of the
+    Streamlit script do not overwrite what the cold start cost.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.first_render_done = False
+        self._lock = threading.Lock()
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self.phases.setdefault(phase, seconds)
+
+    @contextmanager
+    def measure(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def import_module(self, name):
+        """Import `name` on first use, timing it if this is the import that actually loads it."""
+        if name in sys.modules:
+            return sys.modules[name]
+        with self.measure(f"import {name}"):
+            return importlib.import_module(name)
+
+    def finish_render(self, script_start):
+        # Only the first full run of the script in this process counts as the cold render
+        with self._lock:
+            if self.first_render_done:
+                return
+            self.first_render_done = True
+        self.record("first render", time.perf_counter() - script_start)
+
+    def total(self):
+        return sum(self.phases.values())
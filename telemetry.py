@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY_LOG_PATH = os.getenv("TELEMETRY_LOG_PATH", os.path.join(".cache", "telemetry.jsonl"))
+# The log is rotated to `<path>.1` once it grows past this size (0: never)
+TELEMETRY_LOG_MAX_BYTES = int(os.getenv("TELEMETRY_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+TELEMETRY_WINDOW = int(os.getenv("TELEMETRY_WINDOW", "5000"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Telemetry:
+    """Records one entry per model call and exports them as JSONL and Prometheus text.
+
+    A rolling window of recent records backs the admin dashboard, while the
+    cumulative counters and histograms back the Prometheus exposition.
+    """
+
+    def __init__(self, log_path=TELEMETRY_LOG_PATH, window=TELEMETRY_WINDOW, log_max_bytes=TELEMETRY_LOG_MAX_BYTES):
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.records = deque(maxlen=window)
+        self._requests = {}  # (feature, model, cache, status) -> count
+        self._tokens = {}  # (feature, direction) -> count
+        self._latency = {}  # feature -> _Histogram
+        self._ttft = {}  # feature -> _Histogram
+        self._counters = {}  # (name, sorted labels) -> value, for counters reported by other components
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()  # only serializes log writes, so metrics never wait on the disk
+
+        if log_path:
+            directory = os.path.dirname(log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def record(self, feature, model, prompt_tokens, response_tokens, elapsed, ttft=None,
+               cache="off", error=None, **extra):
+        entry = {
+            "ts": time.time(),
+            "feature": feature or "unknown",
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+            "elapsed": round(elapsed, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "cache": cache,
+            "error": error,
+        }
+        entry.update(extra)
+        status = "error" if error else "ok"
+
+        with self._lock:
+            self.records.append(entry)
+            key = (entry["feature"], model, cache, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for direction, count in (("prompt", prompt_tokens), ("response", response_tokens)):
+                token_key = (entry["feature"], direction)
+                self._tokens[token_key] = self._tokens.get(token_key, 0) + (count or 0)
+            self._latency.setdefault(entry["feature"], _Histogram()).observe(elapsed)
+            if ttft is not None:
+                self._ttft.setdefault(entry["feature"], _Histogram()).observe(ttft)
+        if self.log_path:
+            self._write_log(json.dumps(entry) + "\n")
+        return entry
+
+    def _write_log(self, line):
+        with self._log_lock:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                    size = f.tell()
+                if self.log_max_bytes and size > self.log_max_bytes:
+                    os.replace(self.log_path, self.log_path + ".1")
+            except OSError:
+                pass
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def counter(self, name):
+        """Total of counter `name` across all label sets."""
+        with self._lock:
+            return sum(value for (counter_name, _), value in self._counters.items() if counter_name == name)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.records)
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP assistant_requests_total Model calls by feature, model, cache status and outcome.")
+            lines.append("# TYPE assistant_requests_total counter")
+            for (feature, model, cache, status), count in sorted(self._requests.items()):
+                lines.append(
+                    f'assistant_requests_total{{feature="{feature}",model="{model}",cache="{cache}",status="{status}"}} {count}'
+                )
+            lines.append("# HELP assistant_tokens_total Estimated prompt and response tokens by feature.")
+            lines.append("# TYPE assistant_tokens_total counter")
+            for (feature, direction), count in sorted(self._tokens.items()):
+                lines.append(f'assistant_tokens_total{{feature="{feature}",direction="{direction}"}} {count}')
+            for name, help_text, histograms in (
+                ("assistant_request_seconds", "Wall time of model calls.", self._latency),
+                ("assistant_time_to_first_token_seconds", "Time to the first streamed token.", self._ttft),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for feature, histogram in sorted(histograms.items()):
+                    for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                        lines.append(f'{name}_bucket{{feature="{feature}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{feature="{feature}",le="+Inf"}} {histogram.total}')
+                    lines.append(f'{name}_sum{{feature="{feature}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{feature="{feature}"}} {histogram.total}')
+            declared = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {name} counter")
+                    declared.add(name)
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(telemetry, port=METRICS_PORT, host="0.0.0.0"):
+    """Serve `GET /metrics` in Prometheus text format from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = telemetry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from memory import estimate_tokens
+from response_cache import normalize_prompt
+
+TRANSLATION_MEMORY_PATH = os.getenv(
+    "TRANSLATION_MEMORY_PATH", os.path.join(".cache", "translation_memory.sqlite3")
+)
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "100000"))
+
+_PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n\s*)")
+
+
+def split_segments(text):
+    """Split `text` into paragraphs and the exact separators between them.
+
+    `join_segments(segments, separators)` gives back the original text, so
+    translated segments can be stitched into the same layout.
+    """
+    parts = _PARAGRAPH_BREAK.split(text)
+    return parts[0::2], parts[1::2]
+
+
+def join_segments(segments, separators):
+    pieces = [segments[0]]
+    for separator, segment in zip(separators, segments[1:]):
+        pieces.extend((separator, segment))
+    return "".join(pieces)
+
+
+def segment_key(source_lang, target_lang, segment):
+    return hashlib.sha256(f"{source_lang}\x00{target_lang}\x00{normalize_prompt(segment)}".encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """On-disk store of translated segments per language pair, so edited documents only re-send what changed.
+
+    Segments are matched on their text, ignoring line endings and trailing spaces; the least
+    recently used entries are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path=TRANSLATION_MEMORY_PATH, max_entries=TRANSLATION_MEMORY_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.reused = 0
+        self.translated = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS segments (
+                    key TEXT PRIMARY KEY,
+                    translation TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS segments_last_access ON segments (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, source_lang, target_lang, segments):
+        """Map the index of every segment with a stored translation to that translation."""
+        keys = {}
+        for index, segment in enumerate(segments):
+            if segment.strip():
+                keys.setdefault(segment_key(source_lang, target_lang, segment), []).append(index)
+        if not keys:
+            return {}
+        found = {}
+        key_list = list(keys)
+        with self._connect() as conn:
+            # Stay under SQLite's bound-parameter limit for very long documents
+            for start in range(0, len(key_list), 500):
+                batch = key_list[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, translation FROM segments WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, translation in rows:
+                    for index in keys[key]:
+                        found[index] = translation
+                conn.executemany(
+                    "UPDATE segments SET last_access = ? WHERE key = ?", [(time.time(), key) for key, _ in rows]
+                )
+        with self._lock:
+            self.reused += len(found)
+            self.tokens_saved += sum(estimate_tokens(segments[index]) for index in found)
+        return found
+
+    def put_many(self, source_lang, target_lang, pairs):
+        """Store `(segment, translation)` pairs."""
+        now = time.time()
+        rows = [
+            (segment_key(source_lang, target_lang, segment), translation, now)
+            for segment, translation in pairs if segment.strip() and translation
+        ]
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO segments (key, translation, last_access) VALUES (?, ?, ?)", rows
+            )
+            count = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM segments WHERE key IN (SELECT key FROM segments ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+        with self._lock:
+            self.translated += len(rows)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM segments")
+        with self._lock:
+            self.reused = 0
+            self.translated = 0
+            self.tokens_saved = 0
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]